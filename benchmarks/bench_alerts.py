@@ -0,0 +1,103 @@
+"""Alert evaluation cost with many alerts on one symbol.
+
+Fills a fresh SQLite database with ALERTS price alerts on BTC (thresholds
+spread evenly over 50k-150k, half "above" and half "below", owned by 1,000
+users), then reports:
+  index build   loading every active alert into the engine's sorted arrays
+  select        finding the alerts a price move crossed, scanning every
+                threshold vs the two bisects the engine uses
+  evaluate      a full evaluation (index sync, conditional UPDATE, outbox
+                rows, commit) for a quiet tick and for a move that fires alerts
+
+    python benchmarks/bench_alerts.py [alerts]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+USERS = 1000
+TICKS = 2000
+
+
+def ms(seconds):
+    return f"{seconds * 1000:.3f} ms"
+
+
+def run(alerts):
+    import _stubs
+    import test
+
+    _stubs.install(test)
+    _stubs.create_schema(test)
+    con = sqlite3.connect(os.environ["DATABASE_URL"].removeprefix("sqlite:///"))
+    con.executemany(
+        "INSERT INTO users (email, password_hash) VALUES (?, ?)",
+        ((f"user{i}@example.com", "x") for i in range(USERS)),
+    )
+    con.executemany(
+        "INSERT INTO alerts (user_id, symbol, metric, direction, threshold, active) VALUES (?, 'BTC', 'price', ?, ?, 1)",
+        ((i % USERS + 1, ("above", "below")[i % 2], 50_000 + 100_000 * i / alerts) for i in range(alerts)),
+    )
+    con.commit()
+    con.close()
+
+    engine = test.AlertEngine()
+    with test.app.app_context():
+        started = time.perf_counter()
+        engine._sync()
+        print(f"  index build    {ms(time.perf_counter() - started)} for {alerts:,} alerts")
+
+    thresholds, ids = engine._index[("BTC", "price", "above")]
+    pairs = list(zip(thresholds, ids))
+    rng = random.Random(0)
+    moves = [(p, p * (1 + rng.uniform(-0.001, 0.001))) for p in (rng.uniform(60_000, 140_000) for _ in range(TICKS))]
+
+    def scan(old, new):
+        return [alert_id for threshold, alert_id in pairs if old < threshold <= new]
+
+    def bisects(old, new):
+        span = engine._crossed("BTC", "price", old, new)
+        return ids[span[1]:span[2]] if span and span[0][2] == "above" else []
+
+    for label, select, ticks in (("select scan", scan, 50), ("select bisect", bisects, TICKS)):
+        timings = []
+        for old, new in moves[:ticks]:
+            started = time.perf_counter()
+            select(old, new)
+            timings.append(time.perf_counter() - started)
+        print(f"  {label:<14} mean {ms(statistics.mean(timings))} per tick")
+
+    timings = []
+    for old, new in moves[:200]:
+        engine._last[("BTC", "price")] = old
+        started = time.perf_counter()
+        engine._evaluate("price", {"BTC": old})
+        timings.append(time.perf_counter() - started)
+    print(f"  evaluate quiet mean {ms(statistics.mean(timings))} per tick")
+
+    engine._last[("BTC", "price")] = 100_000
+    started = time.perf_counter()
+    fired = engine._evaluate("price", {"BTC": 101_000})
+    elapsed = time.perf_counter() - started
+    with test.app.app_context():
+        queued = test.db.session.scalar(test.db.select(test.db.func.count()).select_from(test.EmailOutbox))
+    print(f"  evaluate +1%   {ms(elapsed)}: {fired} fired, {queued} email(s) queued")
+
+
+def main(alerts=300_000):
+    print(f"{alerts:,} price alerts on one symbol")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db", ALERTS="0")
+        subprocess.run([sys.executable, __file__, "--run", str(alerts)], env=env, check=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(int(sys.argv[2]))
+    else:
+        main(*[int(arg) for arg in sys.argv[1:2]])
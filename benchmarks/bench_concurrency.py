@@ -0,0 +1,92 @@
+"""Throughput of one gunicorn worker per SERVER_PROFILE with slow upstreams.
+
+Each profile gets a fresh gunicorn (one worker, gunicorn.conf.py from the repo
+root) serving benchmarks/stub_app.py, where yfinance and the LLM are stubs that
+sleep like the real services. A fixed number of clients then hit /api/analysis
+at once; caches are off, so every request waits on both upstreams.
+
+    python benchmarks/bench_concurrency.py [clients] [requests]
+"""
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import _stubs  # noqa: F401  (launched servers inherit its throwaway DATABASE_URL)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+PROFILES = ["sync", "gthread"] + (["gevent"] if importlib.util.find_spec("gevent") else [])
+COINS = ["BTC", "ETH", "SOL", "XRP", "DOGE"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(profile, port):
+    env = dict(
+        os.environ, SERVER_PROFILE=profile, WEB_CONCURRENCY="1",
+        DATA_LATENCY="0.2", LLM_STUB_LATENCY="0.5",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+         "--chdir", HERE, "--bind", f"127.0.0.1:{port}", "stub_app:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health/llm", timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"gunicorn ({profile}) did not come up")
+
+
+def fetch(url):
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - started
+
+
+def run(profile, clients, requests):
+    port = free_port()
+    server = start_server(profile, port)
+    try:
+        urls = [
+            f"http://127.0.0.1:{port}/api/analysis?coin={COINS[i % len(COINS)]}&days={30 + i}"
+            for i in range(requests)
+        ]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            latencies = sorted(pool.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+    return requests / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main(clients=16, requests=64):
+    print(f"/api/analysis, 1 worker, {clients} clients, {requests} requests "
+          f"(data 0.2 s + LLM 0.5 s per request)")
+    baseline = None
+    for profile in PROFILES:
+        rate, p50, p95 = run(profile, clients, requests)
+        baseline = baseline or rate
+        print(f"  {profile:<8} {rate:6.2f} req/s  p50 {p50:6.2f} s  p95 {p95:6.2f} s  "
+              f"({rate / baseline:.1f}x sync)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,93 @@
+"""Mixed read/write throughput on SQLite with and without the engine tuning.
+
+Each thread logs in as its own user and loops over add-to-watchlist,
+remove-from-watchlist, subscribe and watchlist reads through the app for a
+fixed time. "default" drops the connect-time pragmas (rollback journal, full
+sync); "tuned" is the app as configured (WAL, synchronous=NORMAL, busy timeout).
+Each mode runs in its own process against a fresh database file.
+
+    python benchmarks/bench_db_concurrency.py [threads] [seconds]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+MODES = ["default", "tuned"]
+
+
+def run(mode, threads, seconds):
+    import _stubs
+    import test
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if mode == "default":
+        event.remove(Engine, "connect", test.tune_sqlite_connection)
+    _stubs.install(test)
+    _stubs.create_schema(test)
+    test.limiter.enabled = False
+
+    with test.app.app_context():
+        users = [test.User(email=f"user{i}@example.com", password_hash="x") for i in range(threads)]
+        test.db.session.add_all(users)
+        test.db.session.commit()
+        user_ids = [user.id for user in users]
+
+    timings, errors = [], []
+    deadline = time.monotonic() + seconds
+
+    def worker(n):
+        client = test.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_ids[n])
+        coins = list(test.COINS)
+        i = 0
+        while time.monotonic() < deadline:
+            coin = coins[i % len(coins)]
+            for method, url, body in (
+                ("post", "/api/watchlist/add", {"symbol": coin}),
+                ("get", "/api/watchlist", None),
+                ("post", "/api/subscribe", {"email": f"t{n}-{i}@example.com"}),
+            ):
+                started = time.perf_counter()
+                response = getattr(client, method)(url, json=body)
+                timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 500:
+                    errors.append(response.status_code)
+            items = client.get("/api/watchlist").get_json()["watchlist"]
+            for item in items:
+                if item["symbol"] == coin:
+                    client.delete(f"/api/watchlist/remove/{item['id']}")
+            i += 1
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    timings.sort()
+    print(
+        f"  {mode:<8} {len(timings) / seconds:7.0f} req/s  "
+        f"p50 {timings[len(timings) // 2]:6.2f} ms  p95 {timings[int(len(timings) * 0.95)]:7.2f} ms  "
+        f"p99 {timings[int(len(timings) * 0.99)]:7.2f} ms  errors {len(errors)}"
+    )
+
+
+def main(threads=16, seconds=10):
+    print(f"{threads} threads for {seconds}s each")
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+            subprocess.run([sys.executable, __file__, "--run", mode, str(threads), str(seconds)], env=env, check=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    else:
+        args = [int(arg) for arg in sys.argv[1:3]]
+        main(*args)
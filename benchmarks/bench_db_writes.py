@@ -0,0 +1,85 @@
+"""Watchlist-add and subscribe latency against tables holding ~1M rows each.
+
+For each schema revision a fresh SQLite database is migrated, filled with 1M
+watchlist rows (14 coins for each of ~71k users) and 1M subscriptions, and
+then POST /api/watchlist/add and POST /api/subscribe are timed through the
+app for new rows. "51f10d50c51a" is the schema before indexes, "head" the
+current one.
+
+    python benchmarks/bench_db_writes.py [rows]
+"""
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REVISIONS = ["51f10d50c51a", "head"]
+REQUESTS = 200
+
+
+def fill(path, rows, coins):
+    users = rows // len(coins) + 1
+    con = sqlite3.connect(path)
+    con.executemany(
+        "INSERT INTO users (id, email, password_hash) VALUES (?, ?, 'x')",
+        ((i, f"user{i}@example.com") for i in range(1, users + REQUESTS + 1)),
+    )
+    con.executemany(
+        "INSERT INTO watchlist (user_id, symbol) VALUES (?, ?)",
+        ((i // len(coins) + 1, coins[i % len(coins)]) for i in range(rows)),
+    )
+    con.executemany("INSERT INTO subscriptions (email) VALUES (?)", ((f"sub{i}@example.com",) for i in range(rows)))
+    con.commit()
+    con.close()
+    return users
+
+
+def timed(call):
+    timings = []
+    for i in range(REQUESTS):
+        started = time.perf_counter()
+        response = call(i)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_data()
+    timings.sort()
+    return f"p50 {statistics.median(timings):6.2f} ms  p95 {timings[int(len(timings) * 0.95)]:6.2f} ms"
+
+
+def run(revision, rows):
+    """Child process: DATABASE_URL is read at import, so each revision gets its own"""
+    import _stubs
+    import test
+
+    _stubs.install(test)
+    test.limiter.enabled = False
+    with test.app.app_context():
+        test.upgrade_schema(revision=revision)
+    users = fill(os.environ["DATABASE_URL"].removeprefix("sqlite:///"), rows, list(test.COINS))
+
+    client = test.app.test_client()
+
+    def add(i):
+        with client.session_transaction() as session:
+            session["_user_id"] = str(users + 1 + i)
+        return client.post("/api/watchlist/add", json={"symbol": "BTC"})
+
+    subscribe = lambda i: client.post("/api/subscribe", json={"email": f"new{i}@example.com"})  # noqa: E731
+    print(f"  {revision:<13} watchlist add {timed(add)}   subscribe {timed(subscribe)}")
+
+
+def main(rows=1_000_000):
+    print(f"{rows:,} rows per table, {REQUESTS} requests each")
+    for revision in REVISIONS:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+            subprocess.run([sys.executable, __file__, "--run", revision, str(rows)], env=env, check=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(sys.argv[2], int(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,74 @@
+"""Daily digest throughput against a large subscriber table.
+
+Fills a fresh SQLite database with SUBSCRIBERS subscriptions spread over the
+supported languages (plus some unknown ones), then runs send_digest() with a
+transport that personalizes every copy like the SMTP/local path does but
+discards it. Reports emails per second and how much the process grew, and
+checks that /unsubscribe turns malformed tokens away with a 400.
+
+    python benchmarks/bench_digest.py [subscribers] [chunk_size]
+"""
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+LANGS = ["en", "es", "fr", "de", "zh", "tr", "pt", None]
+
+
+def run(subscribers, chunk_size):
+    import _stubs
+    import test
+
+    _stubs.install(test)
+    _stubs.create_schema(test)
+    con = sqlite3.connect(os.environ["DATABASE_URL"].removeprefix("sqlite:///"))
+    con.executemany(
+        "INSERT INTO subscriptions (email, language) VALUES (?, ?)",
+        ((f"sub{i}@example.com", LANGS[i % len(LANGS)]) for i in range(subscribers)),
+    )
+    con.commit()
+    con.close()
+
+    class DiscardingTransport(test.EmailTransport):
+        name = "discard"
+
+        def send_bulk(self, email, recipients):
+            for to in recipients:
+                test.personalize_email(email, to)
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with test.app.app_context():
+        stats = test.send_digest("2026-01-01", chunk_size, transport=DiscardingTransport())
+    grown = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+    for lang, lang_stats in stats["languages"].items():
+        print(f"  {lang}: {lang_stats['sent']:>7} in {lang_stats['chunks']:>4} chunk(s)  {lang_stats['seconds']:6.2f}s")
+    print(
+        f"  total {stats['sent']} sent, {stats['failed']} failed in {stats['seconds']}s "
+        f"-> {stats['per_second']} emails/s, max RSS +{grown / 1024:.1f} MB"
+    )
+
+    test.limiter.enabled = False
+    client = test.app.test_client()
+    genuine = test.unsubscribe_token("sub0@example.com")
+    malformed = ["", "bogus", "é.abc", "YQ.é", "!!!.x", genuine[:-2], test.unsubscribe_token("other@example.com")[:-1]]
+    statuses = {token: client.get("/unsubscribe", query_string={"token": token}).status_code for token in malformed}
+    assert all(status == 400 for status in statuses.values()), statuses
+    print(f"  /unsubscribe: {len(malformed)} malformed tokens -> 400, genuine -> {client.get('/unsubscribe', query_string={'token': genuine}).status_code}")
+
+
+def main(subscribers=200_000, chunk_size=1000):
+    print(f"{subscribers:,} subscribers, chunks of {chunk_size}")
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/bench.db")
+        subprocess.run([sys.executable, __file__, "--run", str(subscribers), str(chunk_size)], env=env, check=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main(*[int(arg) for arg in sys.argv[1:3]])
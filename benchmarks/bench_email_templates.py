@@ -0,0 +1,42 @@
+"""Per-recipient cost of building an email, and the size of every template.
+
+  uncached  build the body from its source and derive the plain-text part for
+            every recipient, i.e. what a send costs without email_template()
+  cached    render_email(): the compiled templates plus the recipient's fields
+
+    python benchmarks/bench_email_templates.py [recipients]
+"""
+import sys
+import time
+
+import _stubs  # noqa: F401  (must come before importing the app)
+import test
+
+
+def uncached(kind, lang, email):
+    subject, html = test.EMAIL_CONTENT[kind](lang)
+    html = test._minify_email_html(html)
+    return subject, html, test.html_to_text(html)
+
+
+def measure(build, recipients):
+    langs = list(test.TRANSLATIONS)
+    started = time.perf_counter()
+    for i in range(recipients):
+        build("subscription", langs[i % len(langs)], email=f"user{i}@example.com")
+    return (time.perf_counter() - started) / recipients * 1e6
+
+
+def main(recipients=20000):
+    test.render_email("subscription", "en", email="")
+    print(f"{recipients} recipients across {len(test.TRANSLATIONS)} languages")
+    print(f"  uncached {measure(uncached, recipients):8.1f} us/email")
+    print(f"  cached   {measure(test.render_email, recipients):8.1f} us/email")
+    print()
+    print(f"  {'lang':<6}{'source':>8}{'html':>8}{'gzip':>8}{'text':>8}  (bytes)")
+    for row in test.email_template_sizes():
+        print(f"  {row['lang']:<6}{row['source']:>8}{row['html']:>8}{row['html_gzip']:>8}{row['text']:>8}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,60 @@
+"""Per-request cost of home() with warm data and analysis caches.
+
+Two numbers are reported:
+  full         home() with its memoized data/analysis lookups
+  render only  the same with those lookups replaced by constants, i.e. the
+               cost of building the page itself
+
+Stages run inline rather than on the deadline pool so the numbers reflect
+page building, not thread hand-offs.
+
+    python benchmarks/bench_home_render.py [requests]
+"""
+import statistics
+import sys
+import time
+
+import _stubs  # noqa: F401  (must come before importing the app)
+import test
+
+_stubs.install(test)
+test.run_within_deadline = lambda fn, *args: fn(*args)
+
+URLS = [f"/?coin={coin}&lang={lang}" for coin in ("BTC", "ETH", "SOL") for lang in test.TRANSLATIONS]
+
+
+def measure(requests):
+    timings = []
+    for i in range(requests):
+        with test.app.test_request_context(URLS[i % len(URLS)]):
+            started = time.perf_counter()
+            test.home()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings
+
+
+def report(label, timings):
+    print(
+        f"  {label:<12} mean {statistics.mean(timings):.3f} ms  "
+        f"p50 {timings[len(timings) // 2]:.3f} ms  "
+        f"p95 {timings[int(len(timings) * 0.95)]:.3f} ms"
+    )
+
+
+def main(requests=3000):
+    client = test.app.test_client()
+    for url in URLS:
+        client.get(url)
+
+    print(f"home() over {requests} requests (warm caches)")
+    report("full", measure(requests))
+
+    frames = {coin: test.get_crypto_data(coin, 90) for coin in ("BTC", "ETH", "SOL")}
+    test.get_crypto_data = lambda symbol, days: frames[symbol]
+    test.get_ai_analysis = lambda *args: ("Stub analysis text.", "Medium")
+    report("render only", measure(requests))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3000)
@@ -0,0 +1,85 @@
+"""Login throughput under a burst, and what the burst does to other requests.
+
+LOGIN_THREADS clients POST /login as fast as they can while one probe thread
+fetches a static asset, for each mode:
+  inline  hashing on the request threads, as before the hashing pool
+  pool    the app as configured (PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE)
+
+    python benchmarks/bench_login.py [login_threads] [seconds]
+"""
+import sys
+import threading
+import time
+
+import _stubs
+import test
+
+_stubs.install(test)
+_stubs.create_schema(test)
+test.limiter.enabled = False
+
+EMAIL, PASSWORD = "bench-login@example.com", "correct horse"
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def burst(threads, seconds):
+    logins, rejected, probes = [], [], []
+    deadline = time.monotonic() + seconds
+
+    def login():
+        client = test.app.test_client()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            response = client.post("/login", data={"email": EMAIL, "password": PASSWORD})
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code == 503:
+                rejected.append(elapsed)
+                time.sleep(int(response.headers["Retry-After"]))
+                continue
+            logins.append(elapsed)
+            client.get("/logout")
+
+    def probe():
+        client = test.app.test_client()
+        url = test.asset_url("dashboard.css")
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            client.get(url)
+            probes.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    pool = [threading.Thread(target=login) for _ in range(threads)] + [threading.Thread(target=probe)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return logins, rejected, probes
+
+
+def main(threads=32, seconds=10):
+    with test.app.app_context():
+        if not test.User.query.filter_by(email=EMAIL).first():
+            user = test.User(email=EMAIL)
+            user.set_password(PASSWORD)
+            test.db.session.add(user)
+            test.db.session.commit()
+
+    print(f"{threads} login threads for {seconds}s, {test.PASSWORD_HASH_METHOD} hashes, "
+          f"{test.PASSWORD_HASH_WORKERS} hash worker(s), queue {test.PASSWORD_HASH_QUEUE}")
+    pooled = test.run_password_hash
+    for label, runner in (("inline", lambda fn, *args: fn(*args)), ("pool", pooled)):
+        test.run_password_hash = runner
+        logins, rejected, probes = burst(threads, seconds)
+        print(
+            f"  {label:<7} {len(logins) / seconds:5.1f} logins/s  p50 {percentile(logins, 0.5):6.0f} ms  "
+            f"p95 {percentile(logins, 0.95):6.0f} ms  busy {len(rejected)} (p50 {percentile(rejected, 0.5):.1f} ms)  "
+            f"| asset p50 {percentile(probes, 0.5):6.1f} ms  p95 {percentile(probes, 0.95):6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,110 @@
+"""Rate limits across gunicorn workers, with memory:// vs shared Redis storage.
+
+Runs stub_app under 4 sync workers and sends 40 POSTs to /api/ask (limit
+"10 per minute" per client) with each storage. With memory:// every worker
+keeps its own window, so up to 10 x workers get through; with Redis the limit
+holds across workers. Also counts Redis round trips per request in-process.
+
+Redis is a local fake (fakeredis[lua], which runs the limiter's Lua scripts):
+
+    pip install "fakeredis[lua]"
+    python benchmarks/bench_ratelimit.py
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_concurrency import HERE, ROOT, free_port
+
+WORKERS = 4
+
+
+def start_fake_redis():
+    from fakeredis import TcpFakeServer
+
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{port}"
+
+
+def ask(url):
+    request = urllib.request.Request(
+        url, data=json.dumps({"question": "What is RSI?", "symbol": "BTC"}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30):
+            return 200
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def accepted(storage_uri):
+    port = free_port()
+    env = dict(os.environ, SERVER_PROFILE="sync", WEB_CONCURRENCY=str(WORKERS), PRELOAD_APP="0",
+               STUB_RATELIMIT="1", RATELIMIT_STORAGE_URI=storage_uri)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+         "--chdir", HERE, "--bind", f"127.0.0.1:{port}", "stub_app:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(8)  # let every worker boot so requests spread across them
+        with ThreadPoolExecutor(max_workers=WORKERS * 2) as pool:
+            codes = list(pool.map(ask, [f"http://127.0.0.1:{port}/api/ask"] * 40))
+    finally:
+        server.terminate()
+        server.wait()
+    return codes.count(200), codes.count(429)
+
+
+def round_trips(storage_uri):
+    """Redis commands sent for a default-limited page and for /api/ask (limit + LLM budget)"""
+    os.environ["RATELIMIT_STORAGE_URI"] = storage_uri
+    import _stubs
+    import redis.connection
+    import test
+
+    _stubs.install(test)
+    sent = []
+    original = redis.connection.AbstractConnection.send_packed_command
+
+    def counting(self, command, check_health=True):
+        sent.append(command)
+        return original(self, command, check_health)
+
+    redis.connection.AbstractConnection.send_packed_command = counting
+    client = test.app.test_client()
+    client.environ_base["REMOTE_ADDR"] = "10.0.0.1"  # a client the load test above did not use up
+    client.get("/login")  # connect and load scripts first
+    for path, call in (("GET /login", lambda: client.get("/login")),
+                       ("POST /api/ask", lambda: client.post("/api/ask", json={"question": "RSI?", "symbol": "BTC"}))):
+        sent.clear()
+        call()
+        print(f"  {path:<14} {len(sent)} Redis round trip(s)")
+
+
+def main():
+    redis_server, redis_uri = start_fake_redis()
+    try:
+        print(f"/api/ask (10 per minute), {WORKERS} workers, 40 requests from one client")
+        for label, uri in (("memory://", "memory://"), ("redis", redis_uri)):
+            ok, limited = accepted(uri)
+            print(f"  {label:<10} {ok:>3} accepted  {limited:>3} rate limited")
+        print("Redis round trips per request")
+        round_trips(redis_uri)
+    finally:
+        redis_server.shutdown()
+        redis_server.server_close()
+
+
+if __name__ == "__main__":
+    main()
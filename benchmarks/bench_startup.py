@@ -0,0 +1,60 @@
+"""Boot time of the app module, with a per-dependency import breakdown.
+
+Imports ``test`` in fresh interpreters (stub LLM, throwaway SQLite) and reports
+the median wall time plus the slowest top-level imports from ``-X importtime``.
+Exits non-zero when the median exceeds STARTUP_BUDGET_MS, so it can gate CI or
+a deploy script.
+
+    STARTUP_BUDGET_MS=1000 python benchmarks/bench_startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+import _stubs
+
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 1000))
+SCRIPT = (
+    "import sys, time; sys.path.insert(0, {root!r}); started = time.perf_counter(); "
+    "import test; print((time.perf_counter() - started) * 1000)"
+).format(root=_stubs.ROOT)
+
+
+def boot(importtime=False):
+    args = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", SCRIPT]
+    result = subprocess.run(args, capture_output=True, text=True, env=os.environ, check=True)
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def top_level_imports(log):
+    """Cumulative microseconds per top-level import in an -X importtime log"""
+    totals = {}
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name[1:]
+        if name.startswith("  ") and not name.startswith("   "):  # imported directly by test
+            totals[name.strip()] = int(cumulative)
+    return totals
+
+
+def main(runs=5):
+    timings = sorted(boot()[0] for _ in range(runs))
+    median = statistics.median(timings)
+    _, log = boot(importtime=True)
+
+    print(f"import test: median {median:.0f} ms over {runs} runs (budget {STARTUP_BUDGET_MS:.0f} ms)")
+    for name, micros in sorted(top_level_imports(log).items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name:<28} {micros / 1000:8.1f} ms")
+
+    if median > STARTUP_BUDGET_MS:
+        print("❌ over startup budget")
+        return 1
+    print("✅ within startup budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
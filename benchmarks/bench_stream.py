@@ -0,0 +1,100 @@
+"""Idle /api/stream connections on one gevent worker: fan-out lag and memory.
+
+Opens N SSE connections (each watching one coin) against stub_app with a
+one-second publish interval, then measures, over a few ticks, how long each
+delta takes from being published to reaching every client, plus the worker's
+RSS with all clients attached.
+
+    python benchmarks/bench_stream.py [clients] [ticks]
+"""
+import json
+import os
+import selectors
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from bench_concurrency import COINS, HERE, ROOT, free_port
+
+
+def start_server(port):
+    env = dict(os.environ, SERVER_PROFILE="gevent", WEB_CONCURRENCY="1", STREAM_INTERVAL="1", QUOTE_TTL="1",
+               CACHE_TYPE="SimpleCache", DATA_LATENCY="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+         "--chdir", HERE, "--bind", f"127.0.0.1:{port}", "--backlog", "4096", "stub_app:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/quote?coins=BTC", timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("gunicorn did not come up")
+
+
+def worker_rss_mb(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        worker = f.read().split()[0]
+    with open(f"/proc/{worker}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+
+def open_streams(port, clients):
+    selector = selectors.DefaultSelector()
+    for i in range(clients):
+        sock = socket.create_connection(("127.0.0.1", port))
+        coin = COINS[i % len(COINS)]
+        sock.sendall(f"GET /api/stream?coins={coin} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, bytearray())
+    return selector
+
+
+def collect(selector, seconds):
+    """Lag (received - published) of every delta delivered within the window"""
+    lags = []
+    until = time.time() + seconds
+    while time.time() < until:
+        for key, _ in selector.select(timeout=0.1):
+            buffer = key.data
+            buffer += key.fileobj.recv(65536)
+            received = time.time()
+            while b"\n\n" in buffer:
+                event, _, rest = bytes(buffer).partition(b"\n\n")
+                buffer[:] = rest
+                for line in event.split(b"\n"):
+                    if line.startswith(b"data: "):
+                        lags.append(received - json.loads(line[6:])["ts"])
+    return lags
+
+
+def main(clients=2000, ticks=5):
+    port = free_port()
+    server = start_server(port)
+    try:
+        baseline = worker_rss_mb(server.pid)
+        started = time.perf_counter()
+        selector = open_streams(port, clients)
+        collect(selector, 3)  # connect, first snapshot/delta
+        print(f"{clients} streams opened in {time.perf_counter() - started:.1f} s, "
+              f"worker RSS {baseline:.0f} MB -> {worker_rss_mb(server.pid):.0f} MB")
+        lags = sorted(collect(selector, ticks))
+        print(f"  {len(lags)} deltas over {ticks} ticks: lag p50 {statistics.median(lags) * 1000:.1f} ms  "
+              f"p95 {lags[int(len(lags) * 0.95)] * 1000:.1f} ms  max {lags[-1] * 1000:.1f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
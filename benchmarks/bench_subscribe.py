@@ -0,0 +1,87 @@
+"""/api/subscribe latency with the email outbox, and how fast the outbox drains.
+
+  inline  the welcome email is sent inside the request, as before the outbox,
+          through a transport that takes SEND_LATENCY per email
+  outbox  the app as configured: the request only writes the subscription and
+          its outbox row
+
+The drain figure is the dispatcher sending the queued emails in batches of
+EMAIL_BATCH_SIZE through the same slow transport.
+
+    python benchmarks/bench_subscribe.py [requests] [send_latency_ms]
+"""
+import contextlib
+import statistics
+import sys
+import time
+
+import _stubs
+import test
+
+_stubs.install(test)
+_stubs.create_schema(test)
+test.limiter.enabled = False
+
+
+class SlowTransport(test.LocalTransport):
+    name = "slow-local"
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    @contextlib.contextmanager
+    def connect(self):
+        def send(email):
+            time.sleep(self.latency)
+            self.sent.append(email)
+
+        yield send
+
+
+def measure(client, requests, prefix):
+    timings = []
+    for i in range(requests):
+        started = time.perf_counter()
+        response = client.post("/api/subscribe", json={"email": f"{prefix}{i}-{time.time_ns()}@example.com"})
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_data()
+    timings.sort()
+    return f"p50 {statistics.median(timings):7.2f} ms  p95 {timings[int(len(timings) * 0.95)]:7.2f} ms"
+
+
+def main(requests=200, send_latency_ms=250):
+    transport = SlowTransport(send_latency_ms / 1000)
+    dispatcher = test.EmailDispatcher(transport)
+    client = test.app.test_client()
+    print(f"{requests} subscribes, {send_latency_ms} ms per email send")
+
+    enqueue = test.enqueue_email
+
+    def enqueue_and_send(kind, to_email, lang="en", key=None):
+        queued = enqueue(kind, to_email, lang, key)
+        subject, html, text = test.render_email(kind, lang, email=to_email)
+        with transport.connect() as send:
+            send(test.SimpleNamespace(key=key, to=to_email, subject=subject, html=html, text=text))
+        return queued
+
+    test.enqueue_email = enqueue_and_send
+    print(f"  inline  {measure(client, min(requests, 40), 'inline')}")
+    test.enqueue_email = enqueue
+    with test.app.app_context():
+        test.EmailOutbox.query.delete()
+        test.db.session.commit()
+    print(f"  outbox  {measure(client, requests, 'outbox')}")
+
+    before = len(transport.sent)
+    started = time.perf_counter()
+    with test.app.app_context():
+        while dispatcher.send_due():
+            pass
+    elapsed = time.perf_counter() - started
+    drained = len(transport.sent) - before
+    print(f"  drained {drained} emails in {elapsed:.1f}s ({drained / elapsed:.1f}/s)")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
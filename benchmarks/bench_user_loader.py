@@ -0,0 +1,61 @@
+"""SQL statements and latency per authenticated request, with and without the user cache.
+
+A logged-in client polls GET /api/settings and GET /api/watchlist; statements
+are counted with a before_cursor_execute listener.
+
+    python benchmarks/bench_user_loader.py [requests]
+"""
+import statistics
+import sys
+import time
+
+import _stubs
+import test
+from sqlalchemy import event
+
+_stubs.install(test)
+_stubs.create_schema(test)
+test.limiter.enabled = False
+
+statements = []
+
+
+def measure(client, requests):
+    timings = []
+    del statements[:]
+    for i in range(requests):
+        started = time.perf_counter()
+        response = client.get("/api/settings" if i % 2 else "/api/watchlist")
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    timings.sort()
+    return timings, len(statements) / requests
+
+
+def main(requests=2000):
+    with test.app.app_context():
+        user = test.User.query.filter_by(email="bench-user@example.com").first()
+        if user is None:
+            user = test.User(email="bench-user@example.com", password_hash="x")
+            test.db.session.add(user)
+            test.db.session.commit()
+        user_id = user.id
+        event.listen(test.db.engine, "before_cursor_execute", lambda *args: statements.append(1))
+
+    client = test.app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+
+    print(f"{requests} authenticated polls")
+    for label, ttl in (("uncached", 0), ("cached", 30)):
+        test.USER_CACHE_TTL = ttl
+        client.get("/api/settings")
+        timings, per_request = measure(client, requests)
+        print(
+            f"  {label:<9} {per_request:.2f} statements/request  "
+            f"mean {statistics.mean(timings):.3f} ms  p50 {timings[len(timings) // 2]:.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
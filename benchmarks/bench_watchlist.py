@@ -0,0 +1,94 @@
+"""GET /api/watchlist with market fields for a 1-coin and a 14-coin watchlist.
+
+  naive    what per-item enrichment costs: get_crypto_data once per coin
+  batched  the app as configured (watchlist_market)
+
+"cold" starts from empty caches with DATA_LATENCY per download (every call to
+the data source is counted); "warm" is the p50 over repeated polls.
+
+    python benchmarks/bench_watchlist.py [polls]
+"""
+import statistics
+import sys
+import time
+
+import _stubs
+import test
+
+DATA_LATENCY = 0.1
+_stubs.install(test, data_latency=DATA_LATENCY)
+_stubs.create_schema(test)
+test.limiter.enabled = False
+test.fetch_quotes = lambda symbols: {}
+
+downloads = []
+_download = test.yf.download
+
+
+def counted_download(*args, **kwargs):
+    downloads.append(args[0])
+    return _download(*args, **kwargs)
+
+
+test.yf.download = counted_download
+batched_market = test.watchlist_market
+
+
+def naive_market(symbols, days=test.WATCHLIST_DAYS):
+    market = {}
+    for symbol in symbols:
+        df = test.get_crypto_data(symbol, days)
+        indicators = test.get_indicator_summary(df)
+        market[symbol] = {
+            "price": float(indicators["price"]),
+            "change_24h": float((indicators["price"] - df["Close"].iloc[-2]) / df["Close"].iloc[-2] * 100),
+            "rsi": float(indicators["rsi"]),
+            "confidence": test.calculate_confidence(indicators),
+        }
+    return market
+
+
+def client_for(email, symbols):
+    with test.app.app_context():
+        user = test.User.query.filter_by(email=email).first()
+        if user is None:
+            user = test.User(email=email, password_hash="x")
+            test.db.session.add(user)
+            test.db.session.commit()
+            for symbol in symbols:
+                test.insert_if_absent(test.Watchlist, user_id=user.id, symbol=symbol)
+            test.db.session.commit()
+        user_id = user.id
+    client = test.app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+    return client
+
+
+def main(polls=200):
+    coins = list(test.COINS)
+    clients = {1: client_for("watch-1@example.com", coins[:1]), len(coins): client_for("watch-all@example.com", coins)}
+    print(f"data source latency {DATA_LATENCY * 1000:.0f} ms per download, {polls} warm polls")
+    for label, market in (("naive", naive_market), ("batched", batched_market)):
+        test.watchlist_market = market
+        for size, client in clients.items():
+            test.cache.clear()
+            del downloads[:]
+            started = time.perf_counter()
+            response = client.get("/api/watchlist")
+            cold = (time.perf_counter() - started) * 1000
+            assert response.status_code == 200 and len(response.get_json()["watchlist"]) == size
+            cold_downloads = len(downloads)
+            timings = []
+            for _ in range(polls):
+                started = time.perf_counter()
+                client.get("/api/watchlist")
+                timings.append((time.perf_counter() - started) * 1000)
+            print(
+                f"  {label:<8} {size:>2} coin(s)  cold {cold:7.1f} ms ({cold_downloads} download(s))  "
+                f"warm p50 {statistics.median(timings):6.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,76 @@
+"""Worker time-to-ready, memory and first-request latency, with and without preload.
+
+Starts gunicorn (gunicorn.conf.py, stub_app with an in-process cache) twice:
+PRELOAD_APP=0, where every worker imports the app itself, and PRELOAD_APP=1,
+where the master imports it and warms the caches before forking. Worker lines
+come from the post_worker_init hook; the first request is a chart that the
+warm-up already rendered.
+
+    python benchmarks/bench_workers.py [workers]
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from bench_concurrency import HERE, ROOT, free_port
+
+READY = re.compile(r"ready in ([\d.]+)s \(RSS (\d+) kB, PSS (\d+) kB\)")
+
+
+def run(preload, workers):
+    port = free_port()
+    env = dict(
+        os.environ, PRELOAD_APP=preload, WEB_CONCURRENCY=str(workers), CACHE_TYPE="SimpleCache",
+        WARM_COINS="BTC,ETH,SOL", DATA_LATENCY="0.2",
+    )
+    launched = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+         "--chdir", HERE, "--bind", f"127.0.0.1:{port}", "stub_app:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    ready = []
+    all_ready = threading.Event()
+
+    def read_log():
+        for line in server.stderr:
+            match = READY.search(line)
+            if match:
+                ready.append(tuple(float(v) for v in match.groups()))
+                if len(ready) == workers:
+                    all_ready.set()
+
+    threading.Thread(target=read_log, daemon=True).start()
+    try:
+        if not all_ready.wait(120):
+            raise RuntimeError("workers did not come up")
+        up = time.perf_counter() - launched
+        started = time.perf_counter()
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/chart?coin=BTC&days=90", timeout=60).read()
+        first = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+    return up, ready, first
+
+
+def main(workers=4):
+    print(f"gunicorn, {workers} workers, stubbed upstreams")
+    for preload in ("0", "1"):
+        up, ready, first = run(preload, workers)
+        print(
+            f"  PRELOAD_APP={preload}  all ready {up:5.2f} s  "
+            f"worker ready {statistics.mean(r[0] for r in ready):5.2f} s  "
+            f"RSS {statistics.mean(r[1] for r in ready) / 1024:6.1f} MB  "
+            f"PSS {statistics.mean(r[2] for r in ready) / 1024:6.1f} MB  "
+            f"first /chart {first * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
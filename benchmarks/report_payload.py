@@ -0,0 +1,46 @@
+"""HTML and asset payload sizes for the main pages.
+
+For each page: the HTML as sent (identity and gzip). For each fingerprinted
+asset the pages reference: its size per encoding. Assets are cached immutable,
+so browsers fetch them once; the HTML is what every page view pays for.
+
+    python benchmarks/report_payload.py
+"""
+import gzip
+import re
+
+import _stubs  # noqa: F401  (must come before importing the app)
+import test
+
+_stubs.install(test)
+
+PAGES = ["/?coin=BTC&lang=en", "/login", "/register"]
+ASSET = re.compile(r'(?:href|src)="(/assets/[^"]+)"')
+
+
+def body(client, url, encoding=None):
+    headers = {"Accept-Encoding": encoding} if encoding else {}
+    response = client.get(url, headers=headers)
+    data = response.get_data()
+    return gzip.decompress(data) if response.headers.get("Content-Encoding") == "gzip" else data, len(data)
+
+
+def main():
+    client = test.app.test_client()
+    assets = set()
+    print(f"{'page':<22} {'html':>9} {'html gz':>9}")
+    for url in PAGES:
+        html, size = body(client, url)
+        _, gz_size = body(client, url, "gzip")
+        print(f"{url:<22} {size:>9,} {gz_size:>9,}")
+        assets.update(ASSET.findall(html.decode()))
+
+    if assets:
+        print(f"\n{'asset (cached immutable)':<40} {'bytes':>9} {'gzip':>9} {'br':>9}")
+        for url in sorted(assets):
+            sizes = [len(client.get(url, headers={"Accept-Encoding": enc}).get_data()) for enc in ("", "gzip", "br")]
+            print(f"{url:<40} {sizes[0]:>9,} {sizes[1]:>9,} {sizes[2]:>9,}")
+
+
+if __name__ == "__main__":
+    main()
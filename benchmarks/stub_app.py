@@ -0,0 +1,36 @@
+"""WSGI entry point for load tests: the real app with stubbed upstreams.
+
+Caching and rate limits are off (STUB_RATELIMIT=1 keeps the limits) so every
+request pays the simulated upstream latency. Quotes follow a random walk so
+streams see a change on every tick.
+
+    DATA_LATENCY=0.2 LLM_STUB_LATENCY=0.5 gunicorn --chdir benchmarks stub_app:app
+"""
+import os
+import random
+import time
+
+import _stubs
+
+os.environ.setdefault("CACHE_TYPE", "NullCache")
+
+import test  # noqa: E402
+
+_stubs.install(test, data_latency=float(os.environ.get("DATA_LATENCY", 0.2)))
+test.limiter.enabled = os.environ.get("STUB_RATELIMIT") == "1"
+
+
+def random_walk_quotes(symbols):
+    now = time.time()
+    return {
+        symbol: {
+            "price": test._quotes.get(symbol, {}).get("price", 100.0) * (1 + random.gauss(0, 0.001)),
+            "as_of": test.pd.Timestamp.now(tz="UTC"),
+            "fetched": now,
+        }
+        for symbol in symbols
+    }
+
+
+test.fetch_quotes = random_walk_quotes
+app = test.app
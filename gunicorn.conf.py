@@ -0,0 +1,105 @@
+"""Gunicorn settings, picked up automatically by `gunicorn test:app`.
+
+SERVER_PROFILE picks how each worker process handles concurrent requests:
+  sync     one request at a time per worker (gunicorn's own default)
+  gthread  a thread pool per worker, so requests waiting on yfinance,
+           Anthropic or SendGrid overlap instead of queueing (default)
+  gevent   cooperative greenlets; suits many slow or long-lived connections
+
+Worker count still comes from WEB_CONCURRENCY and the bind address from PORT,
+both of which gunicorn reads on its own.
+
+With PRELOAD_APP on (the default except under gevent, whose monkey-patching has
+to happen before the app is imported) the master imports the app once, warms
+the market-data and chart caches, and then forks, so workers start hot and
+share those pages copy-on-write. Without preload, each worker imports the heavy
+dependencies on a background thread once it is serving. Each worker logs its
+time-to-ready and memory, and starts its email outbox dispatcher and alert engine.
+
+Pending schema migrations are applied once at startup, before any worker runs
+(MIGRATE_ON_START=0 to leave that to a release step such as
+`flask --app test db upgrade`, e.g. when several instances start together).
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+SERVER_PROFILE = os.environ.get("SERVER_PROFILE", "gthread")
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+if SERVER_PROFILE == "gthread":
+    worker_class = "gthread"
+    threads = int(os.environ.get("GUNICORN_THREADS", 16))
+    # Each open /api/stream (LIVE_STREAM=1) holds one of these threads
+    os.environ.setdefault("STREAM_MAX_CLIENTS", str(max(1, threads // 4)))
+elif SERVER_PROFILE == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 10000))
+    # Idle /api/stream connections are cheap here, so the dashboard uses them
+    os.environ.setdefault("LIVE_STREAM", "1")
+elif SERVER_PROFILE == "sync":
+    worker_class = "sync"
+    # A stream would hold the worker's only request slot
+    os.environ.setdefault("STREAM_MAX_CLIENTS", "0")
+else:
+    raise RuntimeError(f"Unknown SERVER_PROFILE {SERVER_PROFILE!r} (expected sync, gthread or gevent)")
+
+preload_app = os.environ.get("PRELOAD_APP", "0" if SERVER_PROFILE == "gevent" else "1") == "1"
+
+
+def _memory_kb():
+    """RSS and PSS of this process from /proc (Linux only)"""
+    usage = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                if key in ("Rss", "Pss"):
+                    usage[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def on_starting(server):
+    if os.environ.get("MIGRATE_ON_START", "1") != "1":
+        return
+    # In a child process so the master never opens (and forks) a DB connection
+    started = time.monotonic()
+    subprocess.run(
+        [sys.executable, "-m", "flask", "--app", "test", "db", "upgrade"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+    )
+    server.log.info("Schema up to date in %.1fs", time.monotonic() - started)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import test
+    started = time.monotonic()
+    warmed = test.warm_caches()
+    server.log.info("Warmed caches for %d coin(s) in %.1fs before forking", warmed, time.monotonic() - started)
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+    if preload_app:
+        import test
+        test.reinit_after_fork()
+
+
+def post_worker_init(worker):
+    memory = _memory_kb()
+    worker.log.info(
+        "Worker %s ready in %.2fs (RSS %s kB, PSS %s kB)",
+        worker.pid, time.monotonic() - worker.forked_at, memory.get("Rss", "?"), memory.get("Pss", "?"),
+    )
+    import test
+    test.start_email_dispatcher()
+    test.start_alert_engine()
+    if not preload_app:
+        threading.Thread(target=test.warm_imports, name="warm-imports", daemon=True).start()
@@ -0,0 +1,45 @@
+"""alerts table and email_outbox.payload for alert notifications
+
+Revision ID: 3c8e5f27a9b4
+Revises: 7b2e4c91d3a6
+Create Date: 2026-10-19 17:20:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e5f27a9b4'
+down_revision = '7b2e4c91d3a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'alerts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('symbol', sa.String(length=10), nullable=False),
+        sa.Column('metric', sa.String(length=10), nullable=False),
+        sa.Column('direction', sa.String(length=10), nullable=False),
+        sa.Column('threshold', sa.Float(), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('triggered_at', sa.DateTime(), nullable=True),
+        sa.Column('triggered_value', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_alerts_active_id', 'alerts', ['active', 'id'])
+    op.create_index('ix_alerts_user_id_symbol', 'alerts', ['user_id', 'symbol'])
+    op.add_column('email_outbox', sa.Column('payload', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.drop_column('payload')
+    op.drop_index('ix_alerts_user_id_symbol', table_name='alerts')
+    op.drop_index('ix_alerts_active_id', table_name='alerts')
+    op.drop_table('alerts')
@@ -0,0 +1,64 @@
+"""Initial schema, as previously created by db.create_all()
+
+Revision ID: 51f10d50c51a
+Revises:
+Create Date: 2026-10-19 11:20:00
+
+Databases created before migrations existed already have these tables; they
+are left as they are so `flask db upgrade` adopts them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '51f10d50c51a'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('preferred_language', sa.String(length=10), nullable=True),
+            sa.Column('preferred_analysis_level', sa.String(length=20), nullable=True),
+            sa.Column('is_premium', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+        )
+
+    if 'watchlist' not in existing:
+        op.create_table(
+            'watchlist',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('symbol', sa.String(length=10), nullable=False),
+            sa.Column('added_at', sa.DateTime(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'subscriptions' not in existing:
+        op.create_table(
+            'subscriptions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('language', sa.String(length=10), nullable=True),
+            sa.Column('subscribed_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+
+def downgrade():
+    op.drop_table('subscriptions')
+    op.drop_table('watchlist')
+    op.drop_table('users')
@@ -0,0 +1,24 @@
+"""Index subscriptions by (language, id) for the daily digest
+
+Revision ID: 7b2e4c91d3a6
+Revises: df6c974d05d1
+Create Date: 2026-10-19 15:40:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4c91d3a6'
+down_revision = 'df6c974d05d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_subscriptions_language_id', 'subscriptions', ['language', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_subscriptions_language_id', table_name='subscriptions')
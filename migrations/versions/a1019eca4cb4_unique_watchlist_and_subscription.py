@@ -0,0 +1,36 @@
+"""Unique indexes on watchlist (user_id, symbol) and subscriptions.email
+
+Revision ID: a1019eca4cb4
+Revises: 51f10d50c51a
+Create Date: 2026-10-19 11:25:00
+
+Duplicates left behind by the old check-then-insert race are removed first,
+keeping the oldest row of each group.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1019eca4cb4'
+down_revision = '51f10d50c51a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(sa.text(
+        "DELETE FROM watchlist WHERE id NOT IN "
+        "(SELECT MIN(id) FROM watchlist GROUP BY user_id, symbol)"
+    ))
+    op.execute(sa.text(
+        "DELETE FROM subscriptions WHERE id NOT IN "
+        "(SELECT MIN(id) FROM subscriptions GROUP BY email)"
+    ))
+    op.create_index('ix_watchlist_user_id_symbol', 'watchlist', ['user_id', 'symbol'], unique=True)
+    op.create_index('ix_subscriptions_email', 'subscriptions', ['email'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_subscriptions_email', table_name='subscriptions')
+    op.drop_index('ix_watchlist_user_id_symbol', table_name='watchlist')
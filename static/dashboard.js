@@ -0,0 +1,118 @@
+// Per-page settings and translated strings come from the inline DASHBOARD object
+
+function updateTimeline(value) {
+    const daysText = DASHBOARD.t.days;
+    document.getElementById('timeline-value').textContent = value + ' ' + daysText;
+    const form = document.getElementById('timeline-form');
+    form.submit();
+}
+
+async function askAI() {
+    const question = document.getElementById('ai-question').value.trim();
+    const answerBox = document.getElementById('answer-box');
+    const answerText = document.getElementById('answer-text');
+    const askButton = document.getElementById('ask-button');
+    const t = DASHBOARD.t;
+
+    if (!question) {
+        alert('Please enter a question!');
+        return;
+    }
+
+    askButton.disabled = true;
+    answerBox.classList.add('show');
+    answerText.innerHTML = '<span class="loading">' + t.thinking + '</span>';
+
+    try {
+        const response = await fetch('/api/ask', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({question: question, symbol: document.getElementById('coin').value})
+        });
+
+        const data = await response.json();
+
+        if (data.error) {
+            answerText.innerHTML = '<strong style="color: #dc2626;">' + t.error + '</strong> ' + data.error;
+        } else {
+            answerText.innerHTML = '<strong>' + t.answer + '</strong> ' + data.answer;
+        }
+    } catch (error) {
+        answerText.innerHTML = '<strong style="color: #dc2626;">' + t.error + '</strong> Failed to get answer. Please try again.';
+    } finally {
+        askButton.disabled = false;
+    }
+}
+
+function handleSubscribe(event) {
+    event.preventDefault();
+    const email = document.getElementById('subscribe-email').value;
+    const lang = DASHBOARD.lang;
+    const button = event.target.querySelector('button');
+    const originalText = button.textContent;
+
+    button.disabled = true;
+    button.textContent = 'Sending...';
+
+    fetch('/api/subscribe', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({email: email, lang: lang})
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert(data.message);
+            document.getElementById('subscribe-email').value = '';
+        } else {
+            alert('Error: ' + (data.error || 'Failed to subscribe'));
+        }
+    })
+    .catch(error => {
+        alert('Error: Failed to subscribe. Please try again.');
+    })
+    .finally(() => {
+        button.disabled = false;
+        button.textContent = originalText;
+    });
+}
+
+function showPrice(price) {
+    document.querySelector('.price-display').textContent = '$' + price.toLocaleString('en-US', {
+        minimumFractionDigits: 2, maximumFractionDigits: 2
+    }) + ' USD';
+}
+
+async function refreshPrice() {
+    const symbol = document.getElementById('coin').value;
+    try {
+        const response = await fetch('/api/quote?coins=' + encodeURIComponent(symbol));
+        const quote = (await response.json()).quotes[symbol];
+        if (quote) showPrice(quote.price);
+    } catch (error) {
+        // keep the last price shown
+    }
+}
+
+function watchPrice() {
+    const symbol = document.getElementById('coin').value;
+    const source = new EventSource('/api/stream?coins=' + encodeURIComponent(symbol));
+    const update = function(event) {
+        const data = JSON.parse(event.data);
+        if (data.price !== undefined) showPrice(data.price);
+    };
+    source.addEventListener('snapshot', update);
+    source.addEventListener('delta', update);
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.getElementById('ai-question').addEventListener('keypress', function(e) {
+        if (e.key === 'Enter') askAI();
+    });
+    if (DASHBOARD.liveStream) {
+        watchPrice();
+    } else {
+        refreshPrice();
+        setInterval(refreshPrice, DASHBOARD.quotePollMs);
+    }
+});
@@ -1,28 +1,105 @@
-from flask import Flask, send_file, request, jsonify, session, redirect, url_for, render_template_string
+from flask import Flask, send_file, request, jsonify, session, redirect, url_for, render_template_string, g, make_response, Response
 from flask_limiter.util import get_remote_address
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate, upgrade as upgrade_schema
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_caching import Cache
+from flask_caching.backends import NullCache, SimpleCache
 from flask_limiter import Limiter
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import yfinance as yf
-import pandas as pd
+from limits import parse as parse_limit
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from types import SimpleNamespace
+from array import array
+from collections import OrderedDict
+from email.message import EmailMessage
+from html.parser import HTMLParser
+from markupsafe import Markup, escape
+import base64
+import bisect
+import functools
+import gzip
+import hashlib
+import hmac
 import io
-import anthropic
+import itertools
+import json
+import math
+import mimetypes
+import queue
+import random
+import re
+import smtplib
+import sqlite3
+import sys
+import threading
+import time
+import click
+import contextlib
+import contextvars
+import importlib
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+
+try:
+    import brotli
+except ImportError:  # optional: responses are still pre-compressed with gzip
+    brotli = None
+
+
+class LazyModule:
+    """Stand-in that imports the named module on first attribute access"""
+
+    def __init__(self, name, setup=None):
+        self._name = name
+        self._setup = setup
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            if self._setup:
+                self._setup()
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+# Heavy dependencies load on first use (or in warm_imports), so routes such as
+# /login and /api/watchlist never pay for them. See benchmarks/bench_startup.py.
+plt = LazyModule("matplotlib.pyplot", setup=lambda: importlib.import_module("matplotlib").use("Agg"))
+mdates = LazyModule("matplotlib.dates")
+yf = LazyModule("yfinance")
+pd = LazyModule("pandas")
+anthropic = LazyModule("anthropic")
+sendgrid = LazyModule("sendgrid")
+sendgrid_mail = LazyModule("sendgrid.helpers.mail")
+LAZY_MODULES = [pd, yf, plt, mdates, anthropic, sendgrid, sendgrid_mail]
+
+
+def warm_imports():
+    """Import every lazily loaded dependency now"""
+    for module in LAZY_MODULES:
+        try:
+            module.load()
+        except ImportError as e:
+            print(f"⚠️ Could not import {module._name}: {e}")
+
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "your-secret-key-change-in-production")
 
 # Configure caching - increased timeout to reduce API calls
-app.config['CACHE_TYPE'] = 'simple'
+# Use CACHE_TYPE=redis (with CACHE_REDIS_URL) to share cached analyses between
+# web workers and the pre-generation job
+app.config['CACHE_TYPE'] = os.environ.get('CACHE_TYPE', 'simple')
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL')
 app.config['CACHE_DEFAULT_TIMEOUT'] = 300
 cache = Cache(app)
 
@@ -33,7 +110,46 @@ if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
     app.config['SQLALCHEMY_DATABASE_URI'] = app.config['SQLALCHEMY_DATABASE_URI'].replace('postgres://', 'postgresql://', 1)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# PostgreSQL pool: each worker process gets its own, so the server must allow
+# workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds; under typical idle-connection cutoffs
+# SQLite: how long a writer waits for the lock before "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+
+def engine_options(uri):
+    """Per-dialect SQLAlchemy engine settings (SQLite pragmas are set on connect)"""
+    if uri.startswith('postgresql'):
+        return {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_pre_ping': True,
+            'pool_recycle': DB_POOL_RECYCLE,
+        }
+    return {}
+
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+
+@event.listens_for(Engine, 'connect')
+def tune_sqlite_connection(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer; NORMAL only fsyncs at checkpoints"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.execute('PRAGMA journal_mode = WAL')
+    cursor.execute('PRAGMA synchronous = NORMAL')
+    cursor.close()
+
 db = SQLAlchemy(app)
+# Schema changes go through migrations/ (flask --app test db upgrade); gunicorn
+# runs the upgrade once at startup, see gunicorn.conf.py
+migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'),
+                  render_as_batch=True)
 
 # Flask-Login configuration
 login_manager = LoginManager()
@@ -41,33 +157,53 @@ login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 # Configure rate limiting
+# Counters live in RATELIMIT_STORAGE_URI (falling back to CACHE_REDIS_URL) so all
+# workers share them; memory:// keeps them per process for local runs. On Redis
+# each moving-window limit is checked and recorded by one atomic script call.
+RATELIMIT_STORAGE_URI = (
+    os.environ.get("RATELIMIT_STORAGE_URI") or os.environ.get("CACHE_REDIS_URL") or "memory://"
+)
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
+    default_limits=["200 per day", "50 per hour"],
+    storage_uri=RATELIMIT_STORAGE_URI,
+    strategy="moving-window",
+    key_prefix="cryptodash",
+    # If Redis goes away, keep limiting per worker rather than failing requests
+    in_memory_fallback_enabled=True,
+    swallow_errors=True
 )
 
 # Get API key from environment variable
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
+ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
+
+# LLM backend: "anthropic" (default) or "stub" for local runs and tests
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "anthropic")
+LLM_STUB_LATENCY = float(os.environ.get("LLM_STUB_LATENCY", 0))
+
+# Generate every language's analysis in one structured model call on a cache miss
+ANALYSIS_FANOUT = os.environ.get("ANALYSIS_FANOUT", "").lower() in ("1", "true", "yes")
+
+# LLM circuit breaker / concurrency limits (per worker)
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", 30))
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", 8))
+LLM_MIN_IN_FLIGHT = int(os.environ.get("LLM_MIN_IN_FLIGHT", 1))
+
+# Budget for model calls across all clients and workers (shares limiter storage)
+LLM_GLOBAL_LIMIT = os.environ.get("LLM_GLOBAL_LIMIT", "120 per minute")
 
 # SendGrid configuration
 SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY")
 EMAIL_FROM = os.environ.get("EMAIL_FROM", "noreply@trading-bot-project-1-h7mi.onrender.com")
 EMAIL_FROM_NAME = os.environ.get("EMAIL_FROM_NAME", "Crypto Dashboard")
+# Where links in emails point (emails are also sent outside any request)
+PUBLIC_URL = os.environ.get("PUBLIC_URL", "https://" + EMAIL_FROM.rsplit("@", 1)[-1]).rstrip("/")
 
-def send_subscription_email(to_email, lang='en'):
-    """Send subscription welcome email with premium features info using SendGrid"""
-    if not SENDGRID_API_KEY:
-        print("❌ ERROR: SendGrid API key not configured")
-        print(f"   SENDGRID_API_KEY: {'SET' if SENDGRID_API_KEY else 'NOT SET'}")
-        return False
-    
-    print(f"📧 Attempting to send email to: {to_email}")
-    print(f"   Using SendGrid API")
-    print(f"   From: {EMAIL_FROM}")
-    
-    t = TRANSLATIONS.get(lang, TRANSLATIONS['en'])
-    
+def subscription_email_content(lang='en'):
+    """Subject and HTML body of the subscription welcome email with premium features info"""
     # Email content based on language
     if lang == 'es':
         subject = "¡Bienvenido a Crypto Dashboard Premium!"
@@ -364,34 +500,168 @@ def send_subscription_email(to_email, lang='en'):
         </html>
         """
     
-    try:
-        # Create SendGrid message
-        message = Mail(
-            from_email=f"{EMAIL_FROM_NAME} <{EMAIL_FROM}>",
-            to_emails=to_email,
-            subject=subject,
-            html_content=body_html
+    return subject, body_html
+
+
+# Per-language wording of alert notifications; the template fields (symbol,
+# coin_name, metric, direction, threshold, value) come from the outbox payload
+ALERT_EMAIL_TEXT = {
+    'en': {'subject': "Alert: {coin} {metric} is {direction} {threshold}", 'body': "{coin} {metric} is now {value}, crossing your alert at {threshold}.",
+           'price': "price", 'rsi': "RSI", 'above': "above", 'below': "below", 'footer': "This alert has now been switched off. You can set a new one from your watchlist."},
+    'es': {'subject': "Alerta: {metric} de {coin} está {direction} {threshold}", 'body': "El {metric} de {coin} es ahora {value} y ha cruzado tu alerta en {threshold}.",
+           'price': "precio", 'rsi': "RSI", 'above': "por encima de", 'below': "por debajo de", 'footer': "Esta alerta se ha desactivado. Puedes crear una nueva desde tu lista de seguimiento."},
+    'fr': {'subject': "Alerte : {metric} de {coin} {direction} {threshold}", 'body': "Le {metric} de {coin} est maintenant de {value} et a franchi votre alerte à {threshold}.",
+           'price': "prix", 'rsi': "RSI", 'above': "au-dessus de", 'below': "en dessous de", 'footer': "Cette alerte est maintenant désactivée. Vous pouvez en créer une nouvelle depuis votre liste de suivi."},
+    'de': {'subject': "Alarm: {coin} {metric} {direction} {threshold}", 'body': "{coin} {metric} liegt jetzt bei {value} und hat Ihren Alarm bei {threshold} ausgelöst.",
+           'price': "Preis", 'rsi': "RSI", 'above': "über", 'below': "unter", 'footer': "Dieser Alarm ist jetzt deaktiviert. Sie können über Ihre Watchlist einen neuen anlegen."},
+    'zh': {'subject': "提醒：{coin} {metric}{direction} {threshold}", 'body': "{coin} {metric}现为 {value}，已触及您设定的 {threshold} 提醒。",
+           'price': "价格", 'rsi': "RSI", 'above': "高于", 'below': "低于", 'footer': "此提醒现已关闭。您可以在关注列表中设置新的提醒。"},
+    'tr': {'subject': "Uyarı: {coin} {metric} {threshold} {direction}", 'body': "{coin} {metric} şu anda {value} ve {threshold} seviyesindeki uyarınızı geçti.",
+           'price': "fiyatı", 'rsi': "RSI", 'above': "üzerinde", 'below': "altında", 'footer': "Bu uyarı artık kapatıldı. İzleme listenizden yeni bir uyarı oluşturabilirsiniz."},
+}
+
+
+def alert_email_content(lang='en'):
+    """Subject and HTML body of a price/RSI alert notification (Jinja fields filled per alert)"""
+    words = ALERT_EMAIL_TEXT.get(lang, ALERT_EMAIL_TEXT['en'])
+    fields = {
+        'coin': "{{ coin_name }} ({{ symbol }})",
+        'metric': "{% if metric == 'rsi' %}" + words['rsi'] + "{% else %}" + words['price'] + "{% endif %}",
+        'direction': "{% if direction == 'above' %}" + words['above'] + "{% else %}" + words['below'] + "{% endif %}",
+        'threshold': "{{ threshold }}",
+        'value': "{{ value }}",
+    }
+    subject = "🔔 " + words['subject'].format(**fields)
+    body_html = f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                    <h2 style="color: #667eea;">{subject}</h2>
+                    <p>{words['body'].format(**fields)}</p>
+                    <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 30px 0;">
+                    <p style="font-size: 12px; color: #6b7280; text-align: center;">{words['footer']}</p>
+                </div>
+            </body>
+        </html>
+        """
+    return subject, body_html
+
+
+# -----------------------------
+# EMAIL TEMPLATES
+# -----------------------------
+# kind -> function(lang) returning (subject, html). The sources are only read
+# once per language: email_template() minifies and compiles them, derives the
+# plain-text alternative and caches the result, so each send just renders the
+# compiled templates with the recipient's fields ({{ email }} and friends).
+EMAIL_CONTENT = {
+    'subscription': subscription_email_content,
+    'alert': alert_email_content,
+}
+
+_email_text_env = app.jinja_env.overlay(autoescape=False)
+
+
+class _EmailTextExtractor(HTMLParser):
+    """Plain-text version of an email body: paragraphs, list bullets, link targets, no markup"""
+    BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "ul", "ol", "table", "tr"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skipping = 0
+        self._href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("style", "script", "title"):
+            self._skipping += 1
+        elif tag == "a":
+            self._href = dict(attrs).get("href")
+        elif tag == "br":
+            self.parts.append("\n")
+        elif tag == "li":
+            self.parts.append("\n- ")
+        elif tag == "hr":
+            self.parts.append("\n\n---\n\n")
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("style", "script", "title"):
+            self._skipping -= 1
+        elif tag == "a" and self._href:
+            # Plain text has no links, so the target follows the link text
+            self.parts.append(f" ({self._href})")
+            self._href = None
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(re.sub(r"\s+", " ", data))
+
+    def text(self):
+        lines = (line.strip() for line in "".join(self.parts).splitlines())
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip() + "\n"
+
+
+def html_to_text(html):
+    extractor = _EmailTextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.text()
+
+
+def _minify_email_html(html):
+    """Drop the source indentation and blank lines (nothing in these bodies is whitespace-sensitive)"""
+    return "\n".join(line.strip() for line in html.splitlines() if line.strip())
+
+
+@functools.lru_cache(maxsize=None)
+def email_template(kind, lang):
+    """Compiled subject, HTML and plain-text templates for one kind and language"""
+    subject, html = EMAIL_CONTENT[kind](lang)
+    html = _minify_email_html(html)
+    return SimpleNamespace(
+        subject=_email_text_env.from_string(subject),
+        html=app.jinja_env.from_string(html),
+        text=_email_text_env.from_string(html_to_text(html)),
+    )
+
+
+def render_email(kind, lang, **fields):
+    """(subject, html, text) for one recipient"""
+    # Unknown languages get English, so the cache stays one entry per real language
+    template = email_template(kind, lang if lang in TRANSLATIONS else 'en')
+    return template.subject.render(fields), template.html.render(fields), template.text.render(fields)
+
+
+def email_template_sizes():
+    """Bytes per kind and language: source HTML, minified HTML, gzipped HTML and plain text"""
+    rows = []
+    for kind in EMAIL_CONTENT:
+        for lang in TRANSLATIONS:
+            _, source = EMAIL_CONTENT[kind](lang)
+            _, html, text = render_email(kind, lang, email="")
+            rows.append({
+                "kind": kind,
+                "lang": lang,
+                "source": len(source.encode()),
+                "html": len(html.encode()),
+                "html_gzip": len(gzip.compress(html.encode())),
+                "text": len(text.encode()),
+            })
+    return rows
+
+
+@app.cli.command("email-sizes")
+def email_sizes_command():
+    """Print the size of every compiled email template"""
+    click.echo(f"{'kind':<14}{'lang':<6}{'source':>8}{'html':>8}{'gzip':>8}{'text':>8}")
+    for row in email_template_sizes():
+        click.echo(
+            f"{row['kind']:<14}{row['lang']:<6}{row['source']:>8}{row['html']:>8}{row['html_gzip']:>8}{row['text']:>8}"
         )
-        
-        print(f"📤 Sending via SendGrid API...")
-        # Send email using SendGrid
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        
-        print(f"✅ Email sent successfully!")
-        print(f"   Status Code: {response.status_code}")
-        print(f"   Response: {response.body}")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ SendGrid ERROR: {e}")
-        print(f"   Error type: {type(e).__name__}")
-        if hasattr(e, 'body'):
-            print(f"   Error body: {e.body}")
-        import traceback
-        traceback.print_exc()
-        return False
 
 # -----------------------------
 # TRANSLATIONS
@@ -429,6 +699,15 @@ TRANSLATIONS = {
         'thinking': '🤔 Thinking...',
         'error': 'Error:',
         'answer': 'Answer:',
+        'analysis_pending': 'AI analysis is being prepared. Please refresh in a moment.',
+        'digest_subject': 'Your daily crypto market digest – {date}',
+        'digest_intro': "Here is today's snapshot of the coins we follow, with a short AI analysis of each.",
+        'digest_change': '24h change',
+        'digest_footer': 'You are receiving this because {email} subscribed to Crypto Dashboard updates.',
+        'digest_unsubscribe': 'Unsubscribe',
+        'unsubscribe_prompt': 'Stop sending Crypto Dashboard emails to {email}?',
+        'unsubscribe_done': '{email} has been unsubscribed. You will not receive further emails.',
+        'unsubscribe_invalid': 'This unsubscribe link is not valid.',
     },
     'es': {
         'title': 'Panel de Criptomonedas',
@@ -462,6 +741,15 @@ TRANSLATIONS = {
         'thinking': '🤔 Pensando...',
         'error': 'Error:',
         'answer': 'Respuesta:',
+        'analysis_pending': 'El análisis de IA se está preparando. Actualice en un momento.',
+        'digest_subject': 'Tu resumen diario del mercado cripto – {date}',
+        'digest_intro': 'Este es el panorama de hoy de las monedas que seguimos, con un breve análisis de IA de cada una.',
+        'digest_change': 'Cambio 24h',
+        'digest_footer': 'Recibes este correo porque {email} se suscribió a las actualizaciones de Crypto Dashboard.',
+        'digest_unsubscribe': 'Darse de baja',
+        'unsubscribe_prompt': '¿Dejar de enviar correos de Crypto Dashboard a {email}?',
+        'unsubscribe_done': '{email} se ha dado de baja. No recibirás más correos.',
+        'unsubscribe_invalid': 'Este enlace para darse de baja no es válido.',
     },
     'fr': {
         'title': 'Tableau de Bord Crypto',
@@ -495,6 +783,15 @@ TRANSLATIONS = {
         'thinking': '🤔 Réflexion...',
         'error': 'Erreur:',
         'answer': 'Réponse:',
+        'analysis_pending': 'L\'analyse IA est en cours de préparation. Veuillez actualiser dans un instant.',
+        'digest_subject': 'Votre résumé quotidien du marché crypto – {date}',
+        'digest_intro': "Voici l'instantané du jour des cryptomonnaies que nous suivons, avec une courte analyse IA pour chacune.",
+        'digest_change': 'Variation 24h',
+        'digest_footer': 'Vous recevez cet email car {email} est abonné aux actualités de Crypto Dashboard.',
+        'digest_unsubscribe': 'Se désabonner',
+        'unsubscribe_prompt': "Ne plus envoyer d'emails de Crypto Dashboard à {email} ?",
+        'unsubscribe_done': "{email} a été désabonné. Vous ne recevrez plus d'emails.",
+        'unsubscribe_invalid': "Ce lien de désabonnement n'est pas valide.",
     },
     'de': {
         'title': 'Krypto-Dashboard',
@@ -528,6 +825,15 @@ TRANSLATIONS = {
         'thinking': '🤔 Denke nach...',
         'error': 'Fehler:',
         'answer': 'Antwort:',
+        'analysis_pending': 'Die KI-Analyse wird vorbereitet. Bitte aktualisieren Sie gleich.',
+        'digest_subject': 'Ihr täglicher Krypto-Marktbericht – {date}',
+        'digest_intro': 'Hier ist der heutige Überblick über die von uns beobachteten Coins, jeweils mit einer kurzen KI-Analyse.',
+        'digest_change': '24h Änderung',
+        'digest_footer': 'Sie erhalten diese E-Mail, weil {email} die Updates von Crypto Dashboard abonniert hat.',
+        'digest_unsubscribe': 'Abmelden',
+        'unsubscribe_prompt': 'Keine E-Mails von Crypto Dashboard mehr an {email} senden?',
+        'unsubscribe_done': '{email} wurde abgemeldet. Sie erhalten keine weiteren E-Mails.',
+        'unsubscribe_invalid': 'Dieser Abmeldelink ist ungültig.',
     },
     'zh': {
         'title': '加密货币仪表板',
@@ -561,6 +867,15 @@ TRANSLATIONS = {
         'thinking': '🤔 思考中...',
         'error': '错误：',
         'answer': '答案：',
+        'analysis_pending': 'AI分析正在准备中，请稍后刷新。',
+        'digest_subject': '您的每日加密市场摘要 – {date}',
+        'digest_intro': '以下是我们关注的币种今日概览，并附有简短的AI分析。',
+        'digest_change': '24小时变化',
+        'digest_footer': '您收到此邮件是因为 {email} 订阅了Crypto Dashboard的更新。',
+        'digest_unsubscribe': '退订',
+        'unsubscribe_prompt': '不再向 {email} 发送Crypto Dashboard邮件？',
+        'unsubscribe_done': '{email} 已退订，您将不会再收到邮件。',
+        'unsubscribe_invalid': '此退订链接无效。',
     },
     'tr': {
         'title': 'Kripto Para Panosu',
@@ -594,9 +909,71 @@ TRANSLATIONS = {
         'thinking': '🤔 Düşünüyor...',
         'error': 'Hata:',
         'answer': 'Cevap:',
+        'analysis_pending': 'Yapay zeka analizi hazırlanıyor. Lütfen birazdan yenileyin.',
+        'digest_subject': 'Günlük kripto piyasası özetiniz – {date}',
+        'digest_intro': 'Takip ettiğimiz coinlerin bugünkü görünümü ve her biri için kısa bir yapay zeka analizi.',
+        'digest_change': '24s değişim',
+        'digest_footer': 'Bu e-postayı {email} adresi Crypto Dashboard güncellemelerine abone olduğu için alıyorsunuz.',
+        'digest_unsubscribe': 'Abonelikten çık',
+        'unsubscribe_prompt': '{email} adresine Crypto Dashboard e-postaları gönderilmesin mi?',
+        'unsubscribe_done': '{email} aboneliği iptal edildi. Artık e-posta almayacaksınız.',
+        'unsubscribe_invalid': 'Bu abonelikten çıkma bağlantısı geçerli değil.',
     }
 }
 
+# -----------------------------
+# PASSWORD HASHING
+# -----------------------------
+# Hashes cost 100+ ms of CPU each, so they run on a small pool sized to the
+# CPUs, and once PASSWORD_HASH_QUEUE attempts are already waiting new ones are
+# turned away instead of piling up behind them. hashlib releases the GIL while
+# hashing, so the pool threads really do run in parallel. Under gevent the pool
+# is one of gevent's native-thread executors: the monkey-patched standard one
+# would hash on the hub and stall every other request meanwhile.
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")  # any Werkzeug method, e.g. pbkdf2:sha256:600000
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Attempts allowed to wait for a hash worker; 4 per worker is ~0.5 s of queueing with scrypt
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 4 * PASSWORD_HASH_WORKERS))
+
+
+def _native_thread_pool(max_workers, thread_name_prefix):
+    """A ThreadPoolExecutor on real OS threads, also when gevent has patched threading"""
+    gevent_monkey = sys.modules.get("gevent.monkey")
+    if gevent_monkey is not None and gevent_monkey.is_module_patched("threading"):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+
+_hash_executor = _native_thread_pool(PASSWORD_HASH_WORKERS, "password-hash")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+
+class PasswordHashBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+PASSWORD_HASH_BUSY_MESSAGE = "Too many sign-in attempts right now, please try again in a moment"
+
+
+def run_password_hash(fn, *args):
+    """Run a hashing call on the pool, or raise PasswordHashBusy when it is full"""
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordHashBusy()
+    try:
+        # Released here rather than in a done callback, which under gevent
+        # would run on the pool thread and touch a hub-bound semaphore
+        return _hash_executor.submit(fn, *args).result()
+    finally:
+        _hash_slots.release()
+
+
+@functools.lru_cache(maxsize=None)
+def password_hash_prefix():
+    """PASSWORD_HASH_METHOD with Werkzeug's defaults filled in, e.g. scrypt:32768:8:1"""
+    return generate_password_hash("", PASSWORD_HASH_METHOD, salt_length=1).split("$", 1)[0]
+
+
 # -----------------------------
 # DATABASE MODELS
 # -----------------------------
@@ -616,14 +993,20 @@ class User(UserMixin, db.Model):
     watchlist = db.relationship('Watchlist', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = run_password_hash(generate_password_hash, password, PASSWORD_HASH_METHOD)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return run_password_hash(check_password_hash, self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """True when the stored hash was made with other parameters than PASSWORD_HASH_METHOD"""
+        return self.password_hash.split("$", 1)[0] != password_hash_prefix()
 
 
 class Watchlist(db.Model):
     __tablename__ = 'watchlist'
+    # One row per (user, coin); also serves every lookup by user_id
+    __table_args__ = (db.Index('ix_watchlist_user_id_symbol', 'user_id', 'symbol', unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     symbol = db.Column(db.String(10), nullable=False)
@@ -633,21 +1016,490 @@ class Watchlist(db.Model):
 
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
+    # The digest pages through subscribers per language in id order
+    __table_args__ = (db.Index('ix_subscriptions_language_id', 'language', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), nullable=False, unique=True, index=True)
     language = db.Column(db.String(10), default='en')
     subscribed_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class EmailOutbox(db.Model):
+    """Emails waiting to be sent; written in the same transaction as whatever triggered them"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    # One email per key however often it is enqueued, e.g. "subscription:<address>"
+    idempotency_key = db.Column(db.String(255), nullable=False, unique=True)
+    kind = db.Column(db.String(32), nullable=False)
+    to_email = db.Column(db.String(120), nullable=False)
+    language = db.Column(db.String(10), default='en')
+    payload = db.Column(db.Text)  # JSON template fields for this email, if any
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending, sent or failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Doubles as the claim lease while a dispatcher is sending the row
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(64))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+class Alert(db.Model):
+    """A one-shot threshold alert on a watchlist coin's price or RSI"""
+    __tablename__ = 'alerts'
+    __table_args__ = (
+        # The alert engine loads active alerts in id order; users list their own
+        db.Index('ix_alerts_active_id', 'active', 'id'),
+        db.Index('ix_alerts_user_id_symbol', 'user_id', 'symbol'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    symbol = db.Column(db.String(10), nullable=False)
+    metric = db.Column(db.String(10), nullable=False)  # price or rsi
+    direction = db.Column(db.String(10), nullable=False)  # above or below
+    threshold = db.Column(db.Float, nullable=False)
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    triggered_at = db.Column(db.DateTime)
+    triggered_value = db.Column(db.Float)
+
+
+# Both dialects spell "skip the row if a unique index already has it" the same way
+_INSERT_IGNORE = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def insert_if_absent(model, **values):
+    """Insert one row in a single statement; False if a unique index already holds it.
+
+    The caller commits, so several inserts can share one transaction.
+    """
+    dialect_insert = _INSERT_IGNORE.get(db.engine.dialect.name)
+    if dialect_insert is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(model(**values))
+            return True
+        except IntegrityError:
+            return False
+    result = db.session.execute(dialect_insert(model).values(**values).on_conflict_do_nothing())
+    return result.rowcount == 1
+
+
+def insert_many_if_absent(model, rows):
+    """insert_if_absent for a list of rows, as one executemany where the dialect allows"""
+    dialect_insert = _INSERT_IGNORE.get(db.engine.dialect.name)
+    if dialect_insert is None:
+        for values in rows:
+            insert_if_absent(model, **values)
+    elif rows:
+        db.session.execute(dialect_insert(model).on_conflict_do_nothing(), rows)
+
+
+# -----------------------------
+# USER CACHE
+# -----------------------------
+# load_user runs on every authenticated request. Rows are kept per worker for
+# USER_CACHE_TTL seconds (0 disables), behind the shared cache, so a change
+# made elsewhere shows up within that bound; ORM updates and logout drop the
+# entry at once. The password hash stays out of the cache and is loaded on
+# demand. The per-worker copy holds at most USER_CACHE_SIZE users, oldest
+# first out, and drops expired entries as new ones arrive.
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+_USER_CACHED_COLUMNS = [c.key for c in User.__table__.columns if c.key != 'password_hash']
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def _user_cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def cached_user_row(user_id):
+    """Column values for a user from memory, the shared cache or the DB"""
+    now = time.time()
+    entry = _user_cache.get(user_id)
+    if entry is None or now - entry[0] >= USER_CACHE_TTL:
+        entry = cache.get(_user_cache_key(user_id))
+        if entry is None or now - entry[0] >= USER_CACHE_TTL:
+            user = db.session.get(User, user_id)
+            if user is None:
+                return None
+            entry = (now, {key: getattr(user, key) for key in _USER_CACHED_COLUMNS})
+            cache.set(_user_cache_key(user_id), entry, timeout=USER_CACHE_TTL)
+        _remember_user_row(user_id, entry, now)
+    return entry[1]
+
+
+def _remember_user_row(user_id, entry, now):
+    with _user_cache_lock:
+        _user_cache[user_id] = entry
+        _user_cache.move_to_end(user_id)
+        # Entries sit in fetch order, so the expired ones are at the front
+        while _user_cache:
+            oldest_id, (fetched, _) = next(iter(_user_cache.items()))
+            if len(_user_cache) <= USER_CACHE_SIZE and now - fetched < USER_CACHE_TTL:
+                break
+            del _user_cache[oldest_id]
+
+
+def invalidate_user(user_id):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+    cache.delete(_user_cache_key(user_id))
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    invalidate_user(target.id)
+
+
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    if USER_CACHE_TTL <= 0:
+        return db.session.get(User, int(user_id))
+    row = cached_user_row(int(user_id))
+    if row is None:
+        return None
+    # Attach a copy to the session without a SELECT; unloaded columns and
+    # relationships still load lazily and edits flush as usual
+    user = User(**row)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+# -----------------------------
+# EMAIL OUTBOX
+# -----------------------------
+# Requests only add rows to email_outbox (enqueue_email, inside their own
+# transaction); a dispatcher thread per worker claims due rows in batches,
+# sends them through one transport connection and records the outcome. A row
+# is claimed by pushing its next_attempt_at out by EMAIL_LEASE_SECONDS, so a
+# worker that dies mid-batch only delays those emails. Delivery is therefore
+# at-least-once; transports pass the idempotency key on so duplicates can be
+# recognised downstream.
+SMTP_HOST = os.environ.get("SMTP_HOST")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "1") == "1"
+
+# sendgrid, smtp or local; by default whichever of the first two is configured
+EMAIL_TRANSPORT = os.environ.get("EMAIL_TRANSPORT") or ("sendgrid" if SENDGRID_API_KEY else "smtp" if SMTP_HOST else "")
+EMAIL_DISPATCHER = os.environ.get("EMAIL_DISPATCHER", "1") == "1"
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", 50))
+EMAIL_POLL_SECONDS = float(os.environ.get("EMAIL_POLL_SECONDS", 5))
+EMAIL_LEASE_SECONDS = int(os.environ.get("EMAIL_LEASE_SECONDS", 300))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", 8))
+EMAIL_RETRY_BASE_SECONDS = float(os.environ.get("EMAIL_RETRY_BASE_SECONDS", 30))  # doubles per attempt
+EMAIL_RETRY_MAX_SECONDS = float(os.environ.get("EMAIL_RETRY_MAX_SECONDS", 3600))
+
+def enqueue_email(kind, to_email, lang='en', key=None, **fields):
+    """Queue an email in the current transaction; False if its key is already queued or sent.
+
+    fields are stored with the row and passed to the template when it is sent.
+    """
+    return insert_if_absent(
+        EmailOutbox, idempotency_key=key or f"{kind}:{to_email}", kind=kind, to_email=to_email, language=lang,
+        payload=json.dumps(fields) if fields else None,
+    )
+
+
+def email_retry_delay(attempts):
+    """Exponential backoff with jitter, so retries after an outage spread out"""
+    delay = min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+# Stand for the recipient's address and unsubscribe link in bulk sends;
+# SendGrid substitutes them server-side, the other transports per recipient
+# in personalize_email()
+BULK_EMAIL_TAG = "-email-"
+BULK_UNSUBSCRIBE_TAG = "-unsubscribe-"
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+# Digests sign one token per recipient, so the keyed HMAC is set up once and
+# copied; tokens are base64url and need no quoting or escaping in links
+_unsubscribe_mac = hmac.new(
+    hmac.new(app.secret_key.encode(), b"unsubscribe", hashlib.sha256).digest(), digestmod=hashlib.sha256
+)
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def unsubscribe_token(email):
+    mac = _unsubscribe_mac.copy()
+    mac.update(email.encode())
+    return f"{_b64(email.encode())}.{_b64(mac.digest()[:16])}"
+
+
+def unsubscribe_url(email):
+    return f"{PUBLIC_URL}/unsubscribe?token={unsubscribe_token(email)}"
+
+
+def unsubscribe_email(token):
+    """The address an unsubscribe token was made for, or None if it is not genuine"""
+    # Genuine tokens are ASCII; compare_digest and b64decode reject anything else
+    if not token.isascii():
+        return None
+    encoded, _, _ = token.partition(".")
+    try:
+        email = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).decode()
+    except ValueError:  # binascii.Error and UnicodeDecodeError included
+        return None
+    return email if hmac.compare_digest(unsubscribe_token(email).encode(), token.encode()) else None
+
+
+def list_unsubscribe_headers(url):
+    """List-Unsubscribe with one-click support (RFC 8058) for mail clients' own button"""
+    return {'List-Unsubscribe': f"<{url}>", 'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click'}
+
+
+def personalize_email(email, to):
+    """One recipient's copy of a bulk email, with their own unsubscribe link"""
+    unsubscribe = unsubscribe_url(to)
+    return SimpleNamespace(
+        key=f"{email.key}:{to}",
+        to=to,
+        subject=email.subject.replace(BULK_EMAIL_TAG, to),
+        html=email.html.replace(BULK_EMAIL_TAG, str(escape(to))).replace(BULK_UNSUBSCRIBE_TAG, unsubscribe),
+        text=email.text.replace(BULK_EMAIL_TAG, to).replace(BULK_UNSUBSCRIBE_TAG, unsubscribe),
+        headers=list_unsubscribe_headers(unsubscribe),
+    )
+
+
+def _message_id(key):
+    """Stable Message-ID per idempotency key, so a resent email is the same message"""
+    return f"<{hashlib.sha256(key.encode()).hexdigest()[:32]}@{EMAIL_FROM.rsplit('@', 1)[-1]}>"
+
+
+class EmailTransport:
+    """connect() yields a send(email) callable that delivers over one connection"""
+    name = None
+
+    def connect(self):
+        raise NotImplementedError
+
+    def send_bulk(self, email, recipients):
+        """Send one email to many addresses, with BULK_EMAIL_TAG replaced by each"""
+        with self.connect() as send:
+            for to in recipients:
+                send(personalize_email(email, to))
+
+
+class SendGridTransport(EmailTransport):
+    name = "sendgrid"
+
+    def _mail(self, email, to=None):
+        message = sendgrid_mail.Mail(
+            from_email=f"{EMAIL_FROM_NAME} <{EMAIL_FROM}>",
+            to_emails=to,
+            subject=email.subject,
+            html_content=email.html,
+            plain_text_content=email.text,
+        )
+        message.custom_arg = sendgrid_mail.CustomArg("idempotency_key", email.key)
+        for name, value in getattr(email, 'headers', {}).items():
+            message.header = sendgrid_mail.Header(name, value)
+        return message
+
+    @staticmethod
+    def _check(response):
+        if response.status_code >= 300:
+            raise RuntimeError(f"SendGrid returned {response.status_code}: {response.body}")
+
+    @contextlib.contextmanager
+    def connect(self):
+        client = sendgrid.SendGridAPIClient(SENDGRID_API_KEY)
+        yield lambda email: self._check(client.send(self._mail(email, email.to)))
+
+    def send_bulk(self, email, recipients):
+        """One API call per SENDGRID_MAX_PERSONALIZATIONS recipients; SendGrid fills in the tags"""
+        client = sendgrid.SendGridAPIClient(SENDGRID_API_KEY)
+        for start in range(0, len(recipients), SENDGRID_MAX_PERSONALIZATIONS):
+            message = self._mail(email)
+            for to in recipients[start:start + SENDGRID_MAX_PERSONALIZATIONS]:
+                unsubscribe = unsubscribe_url(to)
+                personalization = sendgrid_mail.Personalization()
+                personalization.add_to(sendgrid_mail.To(to))
+                personalization.add_substitution(sendgrid_mail.Substitution(BULK_EMAIL_TAG, to))
+                personalization.add_substitution(sendgrid_mail.Substitution(BULK_UNSUBSCRIBE_TAG, unsubscribe))
+                for name, value in list_unsubscribe_headers(unsubscribe).items():
+                    personalization.add_header(sendgrid_mail.Header(name, value))
+                message.add_personalization(personalization)
+            self._check(client.send(message))
+
+
+class SMTPTransport(EmailTransport):
+    name = "smtp"
+
+    @contextlib.contextmanager
+    def connect(self):
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as smtp:
+            if SMTP_STARTTLS:
+                smtp.starttls()
+            if SMTP_USERNAME:
+                smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+
+            def send(email):
+                message = EmailMessage()
+                message["From"] = f"{EMAIL_FROM_NAME} <{EMAIL_FROM}>"
+                message["To"] = email.to
+                message["Subject"] = email.subject
+                message["Message-ID"] = _message_id(email.key)
+                for name, value in getattr(email, 'headers', {}).items():
+                    message[name] = value
+                message.set_content(email.text)
+                message.add_alternative(email.html, subtype="html")
+                smtp.send_message(message)
+
+            yield send
+
+
+class LocalTransport(EmailTransport):
+    """Keeps sent emails in memory instead of delivering them (development and benchmarks)"""
+    name = "local"
+
+    def __init__(self):
+        self.sent = []
+
+    @contextlib.contextmanager
+    def connect(self):
+        def send(email):
+            self.sent.append(email)
+            print(f"📧 [local] {email.subject!r} -> {email.to}")
+
+        yield send
+
+    def send_bulk(self, email, recipients):
+        self.sent.extend(personalize_email(email, to) for to in recipients)
+        print(f"📧 [local] {email.subject!r} -> {len(recipients)} recipient(s)")
+
+
+EMAIL_TRANSPORTS = {cls.name: cls for cls in (SendGridTransport, SMTPTransport, LocalTransport)}
+email_transport = EMAIL_TRANSPORTS[EMAIL_TRANSPORT]() if EMAIL_TRANSPORT else None
+
+
+class EmailDispatcher:
+    """Background thread that drains the outbox in batches"""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                with app.app_context():
+                    handled = self.send_due()
+            except Exception as e:
+                print(f"⚠️ Email dispatcher error: {e}")
+                handled = 0
+            # A full batch means more may be due already
+            if handled < EMAIL_BATCH_SIZE:
+                self._wake.wait(EMAIL_POLL_SECONDS)
+                self._wake.clear()
+
+    def claim(self):
+        """Lease up to EMAIL_BATCH_SIZE due rows to this dispatcher"""
+        now = datetime.utcnow()
+        due = (EmailOutbox.status == 'pending') & (EmailOutbox.next_attempt_at <= now)
+        ids = db.session.scalars(
+            db.select(EmailOutbox.id).where(due).order_by(EmailOutbox.id).limit(EMAIL_BATCH_SIZE)
+        ).all()
+        if not ids:
+            return []
+        token = os.urandom(8).hex()
+        db.session.execute(
+            db.update(EmailOutbox).where(EmailOutbox.id.in_(ids), due)
+            .values(claimed_by=token, next_attempt_at=now + timedelta(seconds=EMAIL_LEASE_SECONDS))
+        )
+        db.session.commit()
+        return EmailOutbox.query.filter_by(claimed_by=token, status='pending').all()
+
+    def send_due(self):
+        """Send one batch of due emails; returns how many rows were handled"""
+        rows = self.claim()
+        if not rows:
+            return 0
+        pending = list(rows)
+        try:
+            with self.transport.connect() as send:
+                while pending:
+                    row = pending[0]
+                    fields = json.loads(row.payload) if row.payload else {}
+                    subject, html, text = render_email(row.kind, row.language, email=row.to_email, **fields)
+                    try:
+                        send(SimpleNamespace(
+                            key=row.idempotency_key, to=row.to_email, subject=subject, html=html, text=text,
+                        ))
+                        row.status, row.sent_at, row.last_error = 'sent', datetime.utcnow(), None
+                    except Exception as e:
+                        self._record_failure(row, e)
+                    pending.pop(0)
+        except Exception as e:
+            # The connection itself failed; whatever was not tried yet counts as a failed attempt
+            for row in pending:
+                self._record_failure(row, e)
+        db.session.commit()
+        sent = sum(row.status == 'sent' for row in rows)
+        print(f"📧 Outbox: sent {sent}/{len(rows)} via {self.transport.name}")
+        return len(rows)
+
+    @staticmethod
+    def _record_failure(row, error):
+        row.attempts += 1
+        row.last_error = f"{type(error).__name__}: {error}"[:1000]
+        if row.attempts >= EMAIL_MAX_ATTEMPTS:
+            row.status = 'failed'
+        else:
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=email_retry_delay(row.attempts))
+
+
+email_dispatcher = EmailDispatcher(email_transport) if email_transport else None
 
 
-# Create database tables
-with app.app_context():
-    db.create_all()
+def start_email_dispatcher():
+    """Start this process's dispatcher thread (call after forking)"""
+    if not EMAIL_DISPATCHER:
+        return
+    if email_dispatcher is None:
+        print("⚠️ No email transport configured (EMAIL_TRANSPORT, SENDGRID_API_KEY or SMTP_HOST); emails stay queued")
+        return
+    email_dispatcher.start()
+
+
+def wake_email_dispatcher():
+    """Have the dispatcher look at the outbox now rather than at its next poll"""
+    if email_dispatcher is not None:
+        email_dispatcher.wake()
+
+
+@app.cli.command("send-emails")
+def send_emails_command():
+    """Send every due outbox email now (e.g. from cron with EMAIL_DISPATCHER=0)"""
+    if email_dispatcher is None:
+        raise click.ClickException("No email transport configured")
+    total = 0
+    while handled := email_dispatcher.send_due():
+        total += handled
+    click.echo(f"Handled {total} email(s)")
+
 
 # -----------------------------
 # SUPPORTED COINS
@@ -697,6 +1549,56 @@ def get_crypto_data(symbol, days=90):
     if isinstance(df.columns, pd.MultiIndex):
         df.columns = [c[0] for c in df.columns]
 
+    df = add_indicators(df)
+    bump_content_version(symbol, days)
+    alert_engine.observe('rsi', {symbol: df['RSI'].iloc[-1]})
+    return df
+
+
+def get_crypto_data_many(symbols, days=90):
+    """get_crypto_data for several coins: cache hits at once, misses in one download.
+
+    Returns {symbol: DataFrame}; coins that could not be loaded are left out.
+    """
+    keys = {symbol: get_crypto_data.make_cache_key(get_crypto_data.uncached, symbol, days) for symbol in symbols}
+    frames = {symbol: df for symbol, df in zip(keys, cache.get_many(*keys.values())) if df is not None}
+    missing = [symbol for symbol in symbols if symbol not in frames]
+    if not missing:
+        return frames
+
+    end = datetime.now()
+    start = end - timedelta(days=days)
+    tickers = [f"{symbol}-USD" for symbol in missing]
+    try:
+        batch = yf.download(
+            tickers,
+            start=start,
+            end=end,
+            group_by="ticker",
+            auto_adjust=True,
+            progress=False,
+            timeout=10
+        )
+    except Exception as e:
+        print(f"Error downloading data: {e}")
+        return frames
+
+    for symbol, ticker in zip(missing, tickers):
+        if ticker not in batch.columns.get_level_values(0):
+            continue
+        df = batch[ticker].dropna(how="all")
+        if df.empty:
+            continue
+        df = add_indicators(df.copy())
+        cache.set(keys[symbol], df, timeout=get_crypto_data.cache_timeout)
+        bump_content_version(symbol, days)
+        frames[symbol] = df
+    alert_engine.observe('rsi', {symbol: frames[symbol]['RSI'].iloc[-1] for symbol in missing if symbol in frames})
+    return frames
+
+
+def add_indicators(df):
+    """Add the EMA, MACD and RSI columns used by the analysis and chart"""
     # EMA
     df["EMA_12"] = df["Close"].ewm(span=12).mean()
     df["EMA_26"] = df["Close"].ewm(span=26).mean()
@@ -715,7 +1617,6 @@ def get_crypto_data(symbol, days=90):
     loss = (-delta.clip(upper=0)).rolling(14).mean()
     rs = gain / loss
     df["RSI"] = 100 - (100 / (1 + rs))
-
     return df
 
 
@@ -855,947 +1756,1541 @@ def create_chart(symbol, days=90):
 
 
 # -----------------------------
-# AI ANALYSIS (CACHED with longer timeout)
+# LIVE QUOTES
 # -----------------------------
-@cache.memoize(timeout=900)  # Cache for 15 minutes to avoid rate limits
-def get_ai_analysis(symbol, interpretation_level='advanced', days=90, lang='en'):
-    """Get AI analysis with timeout and confidence"""
-    if not ANTHROPIC_API_KEY:
-        return "AI analysis unavailable: API key not configured.", "N/A"
-    
-    t = TRANSLATIONS.get(lang, TRANSLATIONS['en'])
-    
-    try:
-        df = get_crypto_data(symbol, days)
-        indicators = get_indicator_summary(df)
-        confidence = calculate_confidence(indicators)
-        
-        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, timeout=15.0)
-        
-        prev = df.iloc[-2]
-        price_change = ((indicators['price'] - prev["Close"]) / prev["Close"]) * 100
-        
-        # Language-specific prompts
-        if lang == 'es':
-            prompt_base = f"""Analiza estos datos técnicos de criptomonedas para {COINS[symbol]} ({symbol}) durante los últimos {days} días:
+# Daily history is cached for minutes; the latest price comes from a small
+# per-symbol record refreshed every QUOTE_TTL seconds by one intraday call
+QUOTE_TTL = float(os.environ.get("QUOTE_TTL", 15))
+_quotes = {}
+_quotes_lock = threading.Lock()
+_quotes_refreshing = set()
+_quote_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quote")
 
-Precio Actual: ${indicators['price']:.2f} (cambio 24h: {price_change:+.2f}%)
 
-Indicadores Técnicos y Tendencias:
-- RSI: {indicators['rsi']:.2f} (cambio 5 días: {indicators['rsi_5d_change']:+.2f})
-- MACD: {indicators['macd']:.4f}
-- Señal MACD: {indicators['macd_signal']:.4f}
-- Histograma MACD: {indicators['macd_hist']:.4f} (cambio 5 días: {indicators['macd_hist_5d_change']:+.4f})
-- Precio vs EMA-50: {indicators['price_vs_ema50_pct']:+.2f}%
-- Alineación EMA: 12=${indicators['ema_12']:.2f}, 26=${indicators['ema_26']:.2f}, 50=${indicators['ema_50']:.2f}
+def fetch_quotes(symbols):
+    """Latest one-minute close per symbol, fetched in a single batched download"""
+    tickers = [f"{symbol}-USD" for symbol in symbols]
+    df = yf.download(
+        tickers,
+        period="1d",
+        interval="1m",
+        group_by="ticker",
+        auto_adjust=True,
+        progress=False,
+        timeout=5
+    )
+    fetched = time.time()
+    quotes = {}
+    for symbol, ticker in zip(symbols, tickers):
+        if ticker not in df.columns.get_level_values(0):
+            continue
+        closes = df[ticker]["Close"].dropna()
+        if not closes.empty:
+            quotes[symbol] = {"price": float(closes.iloc[-1]), "as_of": closes.index[-1], "fetched": fetched}
+    return quotes
 
-"""
-            if interpretation_level == 'beginner':
-                prompt_base += """Proporciona una explicación simple (2-3 oraciones) de lo que significan estos indicadores en español claro.
-Enfócate en si el sentimiento del mercado parece positivo, negativo o neutral. Evita la jerga técnica.
 
-IMPORTANTE: Este es solo análisis educativo, no asesoramiento financiero. No uses palabras como "comprar", "vender" o "precio objetivo"."""
-            else:
-                prompt_base += """Proporciona un análisis técnico (3-4 oraciones) cubriendo:
-1. Tendencia general basada en la alineación de indicadores
-2. Señales de momento del RSI y tendencias MACD
-3. Observaciones clave de los cambios de 5 días
+def refresh_quotes(symbols):
+    try:
+        quotes = fetch_quotes(symbols)
+    except Exception as e:
+        print(f"Error refreshing quotes: {e}")
+        quotes = {}
+    with _quotes_lock:
+        _quotes.update(quotes)
+        _quotes_refreshing.difference_update(symbols)
+    alert_engine.observe('price', {symbol: quote['price'] for symbol, quote in quotes.items()})
+    return quotes
 
-IMPORTANTE: Este es solo análisis educativo, no asesoramiento financiero. Enfócate en la interpretación, no en recomendaciones de trading."""
-        
-        elif lang == 'fr':
-            prompt_base = f"""Analysez ces données techniques de cryptomonnaie pour {COINS[symbol]} ({symbol}) sur les {days} derniers jours:
 
-Prix Actuel: ${indicators['price']:.2f} (changement 24h: {price_change:+.2f}%)
+def get_quotes(symbols, wait=True):
+    """Latest known quote per symbol; stale ones refresh in the background"""
+    now = time.time()
+    with _quotes_lock:
+        quotes = {symbol: _quotes.get(symbol) for symbol in symbols}
+        stale = [
+            symbol for symbol, quote in quotes.items()
+            if (quote is None or now - quote["fetched"] > QUOTE_TTL) and symbol not in _quotes_refreshing
+        ]
+        _quotes_refreshing.update(stale)
+    if stale:
+        future = _quote_executor.submit(refresh_quotes, stale)
+        # Only wait when there is nothing at all to serve yet
+        if wait and any(quotes[symbol] is None for symbol in stale):
+            try:
+                quotes.update(future.result(timeout=remaining_budget(5)))
+            except FuturesTimeoutError:
+                pass
+    return {symbol: quote for symbol, quote in quotes.items() if quote is not None}
 
-Indicateurs Techniques et Tendances:
-- RSI: {indicators['rsi']:.2f} (changement 5 jours: {indicators['rsi_5d_change']:+.2f})
-- MACD: {indicators['macd']:.4f}
-- Signal MACD: {indicators['macd_signal']:.4f}
-- Histogramme MACD: {indicators['macd_hist']:.4f} (changement 5 jours: {indicators['macd_hist_5d_change']:+.4f})
-- Prix vs EMA-50: {indicators['price_vs_ema50_pct']:+.2f}%
-- Alignement EMA: 12=${indicators['ema_12']:.2f}, 26=${indicators['ema_26']:.2f}, 50=${indicators['ema_50']:.2f}
 
-"""
-            if interpretation_level == 'beginner':
-                prompt_base += """Fournissez une explication simple (2-3 phrases) de ce que signifient ces indicateurs en français clair.
-Concentrez-vous sur la question de savoir si le sentiment du marché semble positif, négatif ou neutre. Évitez le jargon.
+def quote_day(quote):
+    """UTC calendar day of a quote, comparable with the daily history index"""
+    as_of = pd.Timestamp(quote["as_of"])
+    if as_of.tzinfo is not None:
+        as_of = as_of.tz_convert("UTC").tz_localize(None)
+    return as_of.normalize()
 
-IMPORTANT: Ceci est uniquement une analyse éducative, pas un conseil financier. N'utilisez pas de mots comme "acheter", "vendre" ou "prix cible"."""
-            else:
-                prompt_base += """Fournissez une analyse technique (3-4 phrases) couvrant:
-1. Tendance globale basée sur l'alignement des indicateurs
-2. Signaux de momentum du RSI et tendances MACD
-3. Observations clés des changements sur 5 jours
 
-IMPORTANT: Ceci est uniquement une analyse éducative, pas un conseil financier. Concentrez-vous sur l'interprétation, pas sur les recommandations de trading."""
-        
-        elif lang == 'de':
-            prompt_base = f"""Analysieren Sie diese Kryptowährungs-Technischen Daten für {COINS[symbol]} ({symbol}) über die letzten {days} Tage:
+def splice_quote(df, symbol):
+    """Daily history with today's close taken from the live quote"""
+    quote = _quotes.get(symbol)
+    if quote is None:
+        return df
+    day = quote_day(quote)
+    last_day = df.index[-1].normalize()
+    if day < last_day:
+        return df
+    df = df.copy()
+    price = quote["price"]
+    if day == last_day:
+        row = df.index[-1]
+        df.loc[row, "Close"] = price
+        df.loc[row, "High"] = max(df.loc[row, "High"], price)
+        df.loc[row, "Low"] = min(df.loc[row, "Low"], price)
+    else:
+        df.loc[day, ["Open", "High", "Low", "Close"]] = price
+    return df
 
-Aktueller Preis: ${indicators['price']:.2f} (24h Änderung: {price_change:+.2f}%)
 
-Technische Indikatoren und Trends:
-- RSI: {indicators['rsi']:.2f} (5-Tage-Änderung: {indicators['rsi_5d_change']:+.2f})
-- MACD: {indicators['macd']:.4f}
-- MACD Signal: {indicators['macd_signal']:.4f}
-- MACD Histogramm: {indicators['macd_hist']:.4f} (5-Tage-Änderung: {indicators['macd_hist_5d_change']:+.4f})
-- Preis vs EMA-50: {indicators['price_vs_ema50_pct']:+.2f}%
-- EMA Ausrichtung: 12=${indicators['ema_12']:.2f}, 26=${indicators['ema_26']:.2f}, 50=${indicators['ema_50']:.2f}
 
-"""
-            if interpretation_level == 'beginner':
-                prompt_base += """Geben Sie eine einfache Erklärung (2-3 Sätze) darüber, was diese Indikatoren in klarem Deutsch bedeuten.
-Konzentrieren Sie sich darauf, ob die Marktstimmung positiv, negativ oder neutral erscheint. Vermeiden Sie Fachjargon.
+# -----------------------------
+# ALERTS ENGINE
+# -----------------------------
+ALERTS_ENABLED = os.environ.get("ALERTS", "1") == "1"
+ALERT_POLL_SECONDS = float(os.environ.get("ALERT_POLL_SECONDS", 30))
+ALERT_INDEX_REBUILD_SECONDS = float(os.environ.get("ALERT_INDEX_REBUILD_SECONDS", 600))
+ALERTS_PER_USER = int(os.environ.get("ALERTS_PER_USER", 50))
+ALERT_METRICS = ('price', 'rsi')
+ALERT_DIRECTIONS = ('above', 'below')
+_ALERT_ID_CHUNK = 500
+
+
+def _format_alert_value(metric, value):
+    return f"{value:.1f}" if metric == 'rsi' else _format_price(value)
+
+
+class AlertEngine:
+    """Fires the alerts whose thresholds a new price or RSI value has crossed
+
+    Active alerts sit per (symbol, metric, direction) in a sorted array of
+    thresholds with a parallel array of ids. A move from old to new can only
+    have crossed the thresholds in between, so two bisects find exactly those
+    alerts however many others there are: "above" fires on old < t <= new,
+    "below" on new <= t < old.
+
+    observe() runs on every quote and history refresh and only queues the
+    values; the index, the database and the notifications are handled on the
+    engine's own thread. Each worker has its own index: alerts created since
+    the last evaluation are added by id first, and the whole index is rebuilt
+    every ALERT_INDEX_REBUILD_SECONDS to drop alerts deleted or fired
+    elsewhere. The conditional UPDATE and the outbox key alert:<id> make an
+    alert fire and notify once however many workers see the crossing.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._index = {}
+        self._last = {}
+        self._synced_id = 0
+        self._built_at = None
+
+    def start(self):
+        """Accept observations from now on and poll watched coins (call after forking)"""
+        if self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alerts")
+        if ALERT_POLL_SECONDS > 0:
+            threading.Thread(target=self._watch, name="alert-watch", daemon=True).start()
+
+    def observe(self, metric, values):
+        """Queue new {symbol: value} readings of a metric for evaluation"""
+        if self._executor is None:
+            return None
+        values = {symbol: float(value) for symbol, value in values.items() if value is not None and not math.isnan(value)}
+        return self._executor.submit(self._evaluate, metric, values) if values else None
+
+    def _watch(self):
+        # Keeps quotes and history refreshing for alerted coins without page
+        # traffic; with a shared cache one worker per interval does it
+        while True:
+            time.sleep(ALERT_POLL_SECONDS)
+            if cache.add("alerts:poll", os.getpid(), timeout=ALERT_POLL_SECONDS):
+                self._executor.submit(self._poll)
+
+    def _poll(self):
+        try:
+            with app.app_context():
+                self._sync()
+                symbols = sorted({symbol for (symbol, _, _), (thresholds, _) in self._index.items() if thresholds})
+                if symbols:
+                    get_quotes(symbols, wait=False)
+                    get_crypto_data_many(symbols, WATCHLIST_DAYS)
+        except Exception as e:
+            print(f"⚠️ Alert poll failed: {e}")
+
+    def _evaluate(self, metric, values):
+        try:
+            with app.app_context():
+                self._sync()
+                crossed = []
+                for symbol, new in values.items():
+                    old = self._last.get((symbol, metric))
+                    self._last[(symbol, metric)] = new
+                    if old is not None and old != new:
+                        span = self._crossed(symbol, metric, old, new)
+                        if span:
+                            crossed.append((new, span))
+                return self._fire(metric, crossed) if crossed else 0
+        except Exception as e:
+            print(f"⚠️ Alert evaluation failed: {e}")
+            return 0
+
+    def _crossed(self, symbol, metric, old, new):
+        """(key, lo, hi): the slice of the index holding thresholds between old and new"""
+        direction, find = ('above', bisect.bisect_right) if new > old else ('below', bisect.bisect_left)
+        key = (symbol, metric, direction)
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+        lo, hi = sorted((find(entry[0], old), find(entry[0], new)))
+        return (key, lo, hi) if hi > lo else None
 
-WICHTIG: Dies ist nur eine Bildungsanalyse, keine Finanzberatung. Verwenden Sie keine Wörter wie "kaufen", "verkaufen" oder "Zielpreis"."""
+    def _fire(self, metric, crossed):
+        now = datetime.utcnow()
+        fired = []
+        for value, (key, lo, hi) in crossed:
+            ids = self._index[key][1][lo:hi].tolist()
+            for start in range(0, len(ids), _ALERT_ID_CHUNK):
+                rows = db.session.execute(
+                    db.update(Alert)
+                    .where(Alert.id.in_(ids[start:start + _ALERT_ID_CHUNK]), Alert.active.is_(True))
+                    .values(active=False, triggered_at=now, triggered_value=value)
+                    .returning(Alert.id, Alert.user_id, Alert.symbol, Alert.metric, Alert.direction, Alert.threshold)
+                ).all()
+                fired.extend((row, value) for row in rows)
+
+        user_ids = sorted({row.user_id for row, _ in fired})
+        users = {}
+        for start in range(0, len(user_ids), _ALERT_ID_CHUNK):
+            users.update((user.id, user) for user in db.session.execute(
+                db.select(User.id, User.email, User.preferred_language)
+                .where(User.id.in_(user_ids[start:start + _ALERT_ID_CHUNK]))
+            ))
+        insert_many_if_absent(EmailOutbox, [{
+            'idempotency_key': f"alert:{row.id}",
+            'kind': 'alert',
+            'to_email': users[row.user_id].email,
+            'language': users[row.user_id].preferred_language or 'en',
+            'payload': json.dumps({
+                'symbol': row.symbol,
+                'coin_name': COINS.get(row.symbol, row.symbol),
+                'metric': row.metric,
+                'direction': row.direction,
+                'threshold': _format_alert_value(row.metric, row.threshold),
+                'value': _format_alert_value(row.metric, value),
+            }),
+        } for row, value in fired if row.user_id in users])
+        db.session.commit()
+
+        # Every crossed alert is inactive now, whether it fired here or elsewhere
+        for _, (key, lo, hi) in crossed:
+            thresholds, ids = self._index[key]
+            del thresholds[lo:hi]
+            del ids[lo:hi]
+        if fired:
+            print(f"🔔 {len(fired)} {metric} alert(s) fired")
+            wake_email_dispatcher()
+        return len(fired)
+
+    def _sync(self):
+        """Index alerts created since the last call; start over every ALERT_INDEX_REBUILD_SECONDS"""
+        now = time.monotonic()
+        if self._built_at is None or now - self._built_at >= ALERT_INDEX_REBUILD_SECONDS:
+            self._index, self._synced_id, self._built_at = {}, 0, now
+        rows = db.session.execute(
+            db.select(Alert.id, Alert.symbol, Alert.metric, Alert.direction, Alert.threshold)
+            .where(Alert.active.is_(True), Alert.id > self._synced_id)
+            .order_by(Alert.id)
+        ).all()
+        if not rows:
+            return
+        self._synced_id = rows[-1].id
+        grouped = {}
+        for row in rows:
+            grouped.setdefault((row.symbol, row.metric, row.direction), []).append((row.threshold, row.id))
+        for key, entries in grouped.items():
+            thresholds, ids = self._index.get(key, (array('d'), array('q')))
+            if len(entries) > 64:
+                # Cheaper to sort everything once than to insert one by one
+                merged = sorted([*zip(thresholds, ids), *entries])
+                thresholds, ids = array('d', (t for t, _ in merged)), array('q', (i for _, i in merged))
             else:
-                prompt_base += """Geben Sie eine technische Analyse (3-4 Sätze) zu:
+                for threshold, alert_id in entries:
+                    at = bisect.bisect_right(thresholds, threshold)
+                    thresholds.insert(at, threshold)
+                    ids.insert(at, alert_id)
+            self._index[key] = (thresholds, ids)
+
+
+alert_engine = AlertEngine()
+
+
+def start_alert_engine():
+    """Start this process's alert engine (call after forking)"""
+    if ALERTS_ENABLED:
+        alert_engine.start()
+
+# -----------------------------
+# LIVE STREAM (SSE)
+# -----------------------------
+# Push prices to the dashboard over /api/stream instead of polling /api/quote.
+# Each open stream holds a connection, so this wants SERVER_PROFILE=gevent
+# (gunicorn.conf.py turns it on there); with it off /api/stream is a 404. On
+# the thread profiles gunicorn.conf.py caps STREAM_MAX_CLIENTS well below the
+# request threads so open tabs cannot starve ordinary requests.
+LIVE_STREAM = os.environ.get("LIVE_STREAM", "0") == "1"
+STREAM_INTERVAL = float(os.environ.get("STREAM_INTERVAL", QUOTE_TTL))
+STREAM_HEARTBEAT = float(os.environ.get("STREAM_HEARTBEAT", 25))
+STREAM_MAX_CLIENTS = int(os.environ.get("STREAM_MAX_CLIENTS", 5000))
+STREAM_QUEUE_SIZE = 16
+STREAM_DAYS = 90
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), allow_nan=False)}\n\n".encode()
+
+
+def stream_state(symbol):
+    """Live price and daily indicators for one symbol, rounded for change detection
+
+    Indicators come from the history as loaded, with only the price taken
+    from the live quote: a row spliced in for a day the history has no bar
+    for yet has no indicators. Values that are not finite are left out.
+    """
+    with app.app_context():
+        df = get_crypto_data(symbol, STREAM_DAYS)
+    state = get_indicator_summary(df)
+    quote = _quotes.get(symbol)
+    if quote is not None and quote_day(quote) >= df.index[-1].normalize():
+        state['price'] = quote['price']
+        state['price_vs_ema50_pct'] = (state['price'] - state['ema_50']) / state['ema_50'] * 100
+    # Significant digits, not decimals: sub-cent coins must still register moves
+    return {key: float(f"{value:.6g}") for key, value in state.items() if math.isfinite(value)}
+
+
+class StreamPublisher:
+    """One thread per worker that polls quotes and fans changes out to stream clients
+
+    Every change is encoded once per symbol; delivering it is a queue put per
+    subscriber. A client whose queue is full gets its backlog replaced by a
+    fresh snapshot instead of blocking the publisher.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._state = {}
+        self._snapshots = {}
+        self._clients = 0
+        self._thread = None
+
+    def subscribe(self, symbols):
+        client = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        with self._lock:
+            for symbol in symbols:
+                self._subscribers.setdefault(symbol, set()).add(client)
+            self._clients += 1
+            snapshots = [self._snapshots[symbol] for symbol in symbols if symbol in self._snapshots]
+            # Started on first use so a preloading gunicorn master never runs it
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="stream-publisher", daemon=True)
+                self._thread.start()
+        for snapshot in snapshots:
+            client.put_nowait(snapshot)
+        return client
+
+    def unsubscribe(self, client, symbols):
+        with self._lock:
+            for symbol in symbols:
+                subscribers = self._subscribers.get(symbol)
+                if subscribers is not None:
+                    subscribers.discard(client)
+                    if not subscribers:
+                        del self._subscribers[symbol]
+            self._clients -= 1
+
+    def client_count(self):
+        return self._clients
+
+    def _run(self):
+        while True:
+            with self._lock:
+                symbols = list(self._subscribers)
+            if symbols:
+                try:
+                    self.publish(symbols)
+                except Exception as e:
+                    print(f"Stream publish failed: {e}")
+            time.sleep(self.interval)
+
+    def publish(self, symbols):
+        get_quotes(symbols)
+        for symbol in symbols:
+            try:
+                state = stream_state(symbol)
+            except Exception as e:
+                print(f"Stream state for {symbol} failed: {e}")
+                continue
+            previous = self._state.get(symbol, {})
+            changed = {key: value for key, value in state.items() if previous.get(key) != value}
+            if not changed:
+                continue
+            self._state[symbol] = state
+            message = sse_event("delta", {"symbol": symbol, "ts": time.time(), **changed})
+            snapshot = sse_event("snapshot", {"symbol": symbol, "ts": time.time(), **state})
+            with self._lock:
+                self._snapshots[symbol] = snapshot
+                clients = list(self._subscribers.get(symbol, ()))
+            for client in clients:
+                try:
+                    client.put_nowait(message)
+                except queue.Full:
+                    with contextlib.suppress(queue.Empty):
+                        while True:
+                            client.get_nowait()
+                    client.put_nowait(snapshot)
+
+
+stream_publisher = StreamPublisher(STREAM_INTERVAL)
+
+
+# -----------------------------
+# REQUEST DEADLINES
+# -----------------------------
+HOME_DEADLINE_SECONDS = float(os.environ.get("HOME_DEADLINE_SECONDS", 2.0))
+STAGE_WORKERS = int(os.environ.get("STAGE_WORKERS", 8))
+
+_request_deadline = contextvars.ContextVar("request_deadline", default=None)
+_stage_executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="stage")
+_stage_in_flight = {}
+_stage_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request has used up its time budget"""
+
+
+@contextlib.contextmanager
+def request_deadline(seconds):
+    """Give everything called inside the block a shared time budget"""
+    token = _request_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_budget(cap=None):
+    """Seconds left before the current deadline, capped at cap (cap when no deadline)"""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return cap
+    remaining = max(0.0, deadline - time.monotonic())
+    return remaining if cap is None else min(cap, remaining)
+
+
+def _call_in_app_context(fn, *args):
+    with app.app_context():
+        return fn(*args)
+
+
+def run_within_deadline(fn, *args):
+    """Wait for fn on the stage pool until the request deadline passes.
+
+    fn runs outside the deadline with its own upstream timeouts, so work a
+    page gives up on still finishes and fills the cache for the next view.
+    Callers asking for the same fn and args while it runs share that run.
+    """
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(fn.__name__)
+    key = (fn, args)
+    with _stage_lock:
+        future = _stage_in_flight.get(key)
+        if future is None:
+            future = _stage_executor.submit(_call_in_app_context, fn, *args)
+            _stage_in_flight[key] = future
+            future.add_done_callback(lambda _: _stage_in_flight.pop(key, None))
+    try:
+        return future.result(timeout=remaining)
+    except FuturesTimeoutError:
+        raise DeadlineExceeded(fn.__name__)
+
+
+# -----------------------------
+# LLM BACKEND
+# -----------------------------
+class LLMUnavailableError(Exception):
+    """Raised when a model call is rejected without reaching the provider"""
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures; half-open lets one probe through"""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print("✅ LLM circuit breaker closed")
+            self.state = "closed"
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                    print(f"⚠️ LLM circuit breaker opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        with self._lock:
+            self.probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'retry_in_seconds': retry_in,
+            }
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD cap on in-flight calls: +1/limit per success, halved on overload"""
+
+    def __init__(self, min_limit, max_limit):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, overloaded=False, succeeded=False):
+        with self._lock:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(self.min_limit, self.limit / 2)
+            elif succeeded:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+            }
+
+
+llm_breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+llm_limiter = AdaptiveConcurrencyLimiter(LLM_MIN_IN_FLIGHT, LLM_MAX_IN_FLIGHT)
+
+
+def llm_available():
+    """True when a model backend is configured"""
+    return LLM_BACKEND == "stub" or bool(ANTHROPIC_API_KEY)
+
+
+llm_budget = parse_limit(LLM_GLOBAL_LIMIT)
+
+
+def llm_budget_hit():
+    """Spend one model call from the global budget; False once it is used up"""
+    try:
+        return limiter.limiter.hit(llm_budget, "llm-budget")
+    except Exception as e:
+        print(f"LLM budget check failed, allowing call: {e}")
+        return True
+
+
+def llm_budget_remaining():
+    try:
+        return limiter.limiter.get_window_stats(llm_budget, "llm-budget").remaining
+    except Exception:
+        return None
+
+
+def create_message(prompt, max_tokens, timeout, system=None):
+    """Send a prompt through the in-flight limiter, circuit breaker and global budget"""
+    if not llm_limiter.acquire():
+        raise LLMUnavailableError("Too many in-flight LLM requests")
+    if not llm_breaker.allow_request():
+        llm_limiter.release()
+        raise LLMUnavailableError("LLM circuit breaker is open")
+    # Spent only once the call is admitted, so rejections don't drain it
+    if not llm_budget_hit():
+        llm_breaker.release_probe()
+        llm_limiter.release()
+        raise LLMUnavailableError("Global LLM call budget exhausted")
+
+    overloaded = succeeded = False
+    try:
+        message = _send_message(prompt, max_tokens, timeout, system)
+        succeeded = True
+        record_llm_usage(message.usage)
+        return message
+    except (anthropic.APITimeoutError, anthropic.RateLimitError):
+        overloaded = True
+        raise
+    finally:
+        if succeeded:
+            llm_breaker.record_success()
+        elif overloaded:
+            llm_breaker.record_failure()
+        else:
+            llm_breaker.release_probe()
+        llm_limiter.release(overloaded=overloaded, succeeded=succeeded)
+
+
+def _send_message(prompt, max_tokens, timeout, system=None):
+    """Send a single-turn prompt to the configured LLM backend"""
+    if LLM_BACKEND == "stub":
+        if LLM_STUB_LATENCY:
+            time.sleep(LLM_STUB_LATENCY)
+        text = f"[stub] {prompt.strip().splitlines()[0][:200]}"
+        json_keys = re.search(r"JSON object whose keys are: ([\w, ]+)\.", prompt)
+        if json_keys:
+            text = json.dumps({code: f"[stub {code}] {text}" for code in json_keys.group(1).split(", ")})
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=text)],
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+        )
+
+    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, timeout=timeout)
+    kwargs = {"system": system} if system else {}
+    return client.messages.create(
+        model=ANTHROPIC_MODEL,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": prompt}],
+        **kwargs
+    )
+
+
+llm_usage = {
+    'requests': 0,
+    'input_tokens': 0,
+    'cache_read_input_tokens': 0,
+    'cache_creation_input_tokens': 0,
+    'output_tokens': 0,
+}
+_llm_usage_lock = threading.Lock()
+
+
+def record_llm_usage(usage):
+    """Log token usage for one model call and add it to the per-worker totals"""
+    counts = {key: getattr(usage, key, 0) or 0 for key in llm_usage if key != 'requests'}
+    with _llm_usage_lock:
+        llm_usage['requests'] += 1
+        for key, value in counts.items():
+            llm_usage[key] += value
+    print(
+        f"🧮 LLM usage: {counts['input_tokens']} input, "
+        f"{counts['cache_read_input_tokens']} cache read, "
+        f"{counts['cache_creation_input_tokens']} cache write, "
+        f"{counts['output_tokens']} output tokens"
+    )
+
+
+# -----------------------------
+# AI ANALYSIS (CACHED with longer timeout)
+# -----------------------------
+# Prompt table: static per-language instructions (cacheable system prefix) and
+# the templates for the short per-call market data suffix
+ANALYSIS_PROMPTS = {
+    'en': {
+        'intro': "Analyze this cryptocurrency technical data for {name} ({symbol}) over the last {days} days:",
+        'market': """Current Price: ${price:.2f} (24h change: {price_change:+.2f}%)
+
+Technical Indicators & Trends:
+- RSI: {rsi:.2f} (5-day change: {rsi_5d_change:+.2f})
+- MACD: {macd:.4f}
+- MACD Signal: {macd_signal:.4f}
+- MACD Histogram: {macd_hist:.4f} (5-day change: {macd_hist_5d_change:+.4f})
+- Price vs EMA-50: {price_vs_ema50_pct:+.2f}%
+- EMA Alignment: 12=${ema_12:.2f}, 26=${ema_26:.2f}, 50=${ema_50:.2f}""",
+        'beginner': """Provide a simple explanation (2-3 sentences) of what these indicators mean in plain English.
+Focus on whether the market sentiment appears positive, negative, or neutral. Avoid jargon.
+
+IMPORTANT: This is educational analysis only, not financial advice. Do not use words like "buy", "sell", or "target price".""",
+        'advanced': """Provide a technical analysis (3-4 sentences) covering:
+1. Overall trend based on indicator alignment
+2. Momentum signals from RSI and MACD trends
+3. Key observations from the 5-day changes
+
+IMPORTANT: This is educational analysis only, not financial advice. Focus on interpretation, not trading recommendations.""",
+    },
+    'es': {
+        'intro': "Analiza estos datos técnicos de criptomonedas para {name} ({symbol}) durante los últimos {days} días:",
+        'market': """Precio Actual: ${price:.2f} (cambio 24h: {price_change:+.2f}%)
+
+Indicadores Técnicos y Tendencias:
+- RSI: {rsi:.2f} (cambio 5 días: {rsi_5d_change:+.2f})
+- MACD: {macd:.4f}
+- Señal MACD: {macd_signal:.4f}
+- Histograma MACD: {macd_hist:.4f} (cambio 5 días: {macd_hist_5d_change:+.4f})
+- Precio vs EMA-50: {price_vs_ema50_pct:+.2f}%
+- Alineación EMA: 12=${ema_12:.2f}, 26=${ema_26:.2f}, 50=${ema_50:.2f}""",
+        'beginner': """Proporciona una explicación simple (2-3 oraciones) de lo que significan estos indicadores en español claro.
+Enfócate en si el sentimiento del mercado parece positivo, negativo o neutral. Evita la jerga técnica.
+
+IMPORTANTE: Este es solo análisis educativo, no asesoramiento financiero. No uses palabras como "comprar", "vender" o "precio objetivo".""",
+        'advanced': """Proporciona un análisis técnico (3-4 oraciones) cubriendo:
+1. Tendencia general basada en la alineación de indicadores
+2. Señales de momento del RSI y tendencias MACD
+3. Observaciones clave de los cambios de 5 días
+
+IMPORTANTE: Este es solo análisis educativo, no asesoramiento financiero. Enfócate en la interpretación, no en recomendaciones de trading.""",
+    },
+    'fr': {
+        'intro': "Analysez ces données techniques de cryptomonnaie pour {name} ({symbol}) sur les {days} derniers jours:",
+        'market': """Prix Actuel: ${price:.2f} (changement 24h: {price_change:+.2f}%)
+
+Indicateurs Techniques et Tendances:
+- RSI: {rsi:.2f} (changement 5 jours: {rsi_5d_change:+.2f})
+- MACD: {macd:.4f}
+- Signal MACD: {macd_signal:.4f}
+- Histogramme MACD: {macd_hist:.4f} (changement 5 jours: {macd_hist_5d_change:+.4f})
+- Prix vs EMA-50: {price_vs_ema50_pct:+.2f}%
+- Alignement EMA: 12=${ema_12:.2f}, 26=${ema_26:.2f}, 50=${ema_50:.2f}""",
+        'beginner': """Fournissez une explication simple (2-3 phrases) de ce que signifient ces indicateurs en français clair.
+Concentrez-vous sur la question de savoir si le sentiment du marché semble positif, négatif ou neutre. Évitez le jargon.
+
+IMPORTANT: Ceci est uniquement une analyse éducative, pas un conseil financier. N'utilisez pas de mots comme "acheter", "vendre" ou "prix cible".""",
+        'advanced': """Fournissez une analyse technique (3-4 phrases) couvrant:
+1. Tendance globale basée sur l'alignement des indicateurs
+2. Signaux de momentum du RSI et tendances MACD
+3. Observations clés des changements sur 5 jours
+
+IMPORTANT: Ceci est uniquement une analyse éducative, pas un conseil financier. Concentrez-vous sur l'interprétation, pas sur les recommandations de trading.""",
+    },
+    'de': {
+        'intro': "Analysieren Sie diese Kryptowährungs-Technischen Daten für {name} ({symbol}) über die letzten {days} Tage:",
+        'market': """Aktueller Preis: ${price:.2f} (24h Änderung: {price_change:+.2f}%)
+
+Technische Indikatoren und Trends:
+- RSI: {rsi:.2f} (5-Tage-Änderung: {rsi_5d_change:+.2f})
+- MACD: {macd:.4f}
+- MACD Signal: {macd_signal:.4f}
+- MACD Histogramm: {macd_hist:.4f} (5-Tage-Änderung: {macd_hist_5d_change:+.4f})
+- Preis vs EMA-50: {price_vs_ema50_pct:+.2f}%
+- EMA Ausrichtung: 12=${ema_12:.2f}, 26=${ema_26:.2f}, 50=${ema_50:.2f}""",
+        'beginner': """Geben Sie eine einfache Erklärung (2-3 Sätze) darüber, was diese Indikatoren in klarem Deutsch bedeuten.
+Konzentrieren Sie sich darauf, ob die Marktstimmung positiv, negativ oder neutral erscheint. Vermeiden Sie Fachjargon.
+
+WICHTIG: Dies ist nur eine Bildungsanalyse, keine Finanzberatung. Verwenden Sie keine Wörter wie "kaufen", "verkaufen" oder "Zielpreis".""",
+        'advanced': """Geben Sie eine technische Analyse (3-4 Sätze) zu:
 1. Gesamttrend basierend auf Indikatorausrichtung
 2. Momentum-Signale von RSI und MACD-Trends
 3. Wichtige Beobachtungen aus den 5-Tage-Änderungen
 
-WICHTIG: Dies ist nur eine Bildungsanalyse, keine Finanzberatung. Konzentrieren Sie sich auf die Interpretation, nicht auf Handelsempfehlungen."""
-        
-        elif lang == 'zh':
-            prompt_base = f"""分析{COINS[symbol]} ({symbol})在过去{days}天的加密货币技术数据：
-
-当前价格：${indicators['price']:.2f}（24小时变化：{price_change:+.2f}%）
+WICHTIG: Dies ist nur eine Bildungsanalyse, keine Finanzberatung. Konzentrieren Sie sich auf die Interpretation, nicht auf Handelsempfehlungen.""",
+    },
+    'zh': {
+        'intro': "分析{name} ({symbol})在过去{days}天的加密货币技术数据：",
+        'market': """当前价格：${price:.2f}（24小时变化：{price_change:+.2f}%）
 
 技术指标和趋势：
-- RSI：{indicators['rsi']:.2f}（5天变化：{indicators['rsi_5d_change']:+.2f}）
-- MACD：{indicators['macd']:.4f}
-- MACD信号：{indicators['macd_signal']:.4f}
-- MACD柱状图：{indicators['macd_hist']:.4f}（5天变化：{indicators['macd_hist_5d_change']:+.4f}）
-- 价格相对EMA-50：{indicators['price_vs_ema50_pct']:+.2f}%
-- EMA排列：12=${indicators['ema_12']:.2f}，26=${indicators['ema_26']:.2f}，50=${indicators['ema_50']:.2f}
-
-"""
-            if interpretation_level == 'beginner':
-                prompt_base += """用简单的中文解释（2-3句话）这些指标的含义。
+- RSI：{rsi:.2f}（5天变化：{rsi_5d_change:+.2f}）
+- MACD：{macd:.4f}
+- MACD信号：{macd_signal:.4f}
+- MACD柱状图：{macd_hist:.4f}（5天变化：{macd_hist_5d_change:+.4f}）
+- 价格相对EMA-50：{price_vs_ema50_pct:+.2f}%
+- EMA排列：12=${ema_12:.2f}，26=${ema_26:.2f}，50=${ema_50:.2f}""",
+        'beginner': """用简单的中文解释（2-3句话）这些指标的含义。
 重点说明市场情绪是看涨、看跌还是中性。避免使用专业术语。
 
-重要提示：这仅用于教育分析，不构成财务建议。不要使用"买入"、"卖出"或"目标价格"等词语。"""
-            else:
-                prompt_base += """提供技术分析（3-4句话），涵盖：
+重要提示：这仅用于教育分析，不构成财务建议。不要使用"买入"、"卖出"或"目标价格"等词语。""",
+        'advanced': """提供技术分析（3-4句话），涵盖：
 1. 基于指标排列的整体趋势
 2. 来自RSI和MACD趋势的动量信号
 3. 5天变化的关键观察
 
-重要提示：这仅用于教育分析，不构成财务建议。专注于解读，而非交易建议。"""
-        
-        elif lang == 'tr':
-            prompt_base = f"""{COINS[symbol]} ({symbol}) için son {days} gün içindeki kripto para teknik verilerini analiz edin:
-
-Güncel Fiyat: ${indicators['price']:.2f} (24s değişim: {price_change:+.2f}%)
+重要提示：这仅用于教育分析，不构成财务建议。专注于解读，而非交易建议。""",
+    },
+    'tr': {
+        'intro': "{name} ({symbol}) için son {days} gün içindeki kripto para teknik verilerini analiz edin:",
+        'market': """Güncel Fiyat: ${price:.2f} (24s değişim: {price_change:+.2f}%)
 
 Teknik Göstergeler ve Trendler:
-- RSI: {indicators['rsi']:.2f} (5 günlük değişim: {indicators['rsi_5d_change']:+.2f})
-- MACD: {indicators['macd']:.4f}
-- MACD Sinyali: {indicators['macd_signal']:.4f}
-- MACD Histogramı: {indicators['macd_hist']:.4f} (5 günlük değişim: {indicators['macd_hist_5d_change']:+.4f})
-- Fiyat vs EMA-50: {indicators['price_vs_ema50_pct']:+.2f}%
-- EMA Hizalaması: 12=${indicators['ema_12']:.2f}, 26=${indicators['ema_26']:.2f}, 50=${indicators['ema_50']:.2f}
-
-"""
-            if interpretation_level == 'beginner':
-                prompt_base += """Bu göstergelerin ne anlama geldiğini basit Türkçe ile açıklayın (2-3 cümle).
+- RSI: {rsi:.2f} (5 günlük değişim: {rsi_5d_change:+.2f})
+- MACD: {macd:.4f}
+- MACD Sinyali: {macd_signal:.4f}
+- MACD Histogramı: {macd_hist:.4f} (5 günlük değişim: {macd_hist_5d_change:+.4f})
+- Fiyat vs EMA-50: {price_vs_ema50_pct:+.2f}%
+- EMA Hizalaması: 12=${ema_12:.2f}, 26=${ema_26:.2f}, 50=${ema_50:.2f}""",
+        'beginner': """Bu göstergelerin ne anlama geldiğini basit Türkçe ile açıklayın (2-3 cümle).
 Piyasa duygusunun olumlu, olumsuz veya nötr görünüp görünmediğine odaklanın. Jargondan kaçının.
 
-ÖNEMLİ: Bu sadece eğitim amaçlı analizdir, finansal tavsiye değildir. "Al", "sat" veya "hedef fiyat" gibi kelimeler kullanmayın."""
-            else:
-                prompt_base += """Teknik analiz sağlayın (3-4 cümle):
+ÖNEMLİ: Bu sadece eğitim amaçlı analizdir, finansal tavsiye değildir. "Al", "sat" veya "hedef fiyat" gibi kelimeler kullanmayın.""",
+        'advanced': """Teknik analiz sağlayın (3-4 cümle):
 1. Gösterge hizalamasına dayalı genel trend
 2. RSI ve MACD trendlerinden momentum sinyalleri
 3. 5 günlük değişimlerden önemli gözlemler
 
-ÖNEMLİ: Bu sadece eğitim amaçlı analizdir, finansal tavsiye değildir. Yoruma odaklanın, alım satım önerilerine değil."""
-        
-        else:  # English (default)
-            prompt_base = f"""Analyze this cryptocurrency technical data for {COINS[symbol]} ({symbol}) over the last {days} days:
+ÖNEMLİ: Bu sadece eğitim amaçlı analizdir, finansal tavsiye değildir. Yoruma odaklanın, alım satım önerilerine değil.""",
+    },
+}
 
-Current Price: ${indicators['price']:.2f} (24h change: {price_change:+.2f}%)
 
-Technical Indicators & Trends:
-- RSI: {indicators['rsi']:.2f} (5-day change: {indicators['rsi_5d_change']:+.2f})
-- MACD: {indicators['macd']:.4f}
-- MACD Signal: {indicators['macd_signal']:.4f}
-- MACD Histogram: {indicators['macd_hist']:.4f} (5-day change: {indicators['macd_hist_5d_change']:+.4f})
-- Price vs EMA-50: {indicators['price_vs_ema50_pct']:+.2f}%
-- EMA Alignment: 12=${indicators['ema_12']:.2f}, 26=${indicators['ema_26']:.2f}, 50=${indicators['ema_50']:.2f}
+def build_analysis_prompt(symbol, interpretation_level, days, lang, indicators, price_change):
+    """Return (system, prompt): static instructions first, per-call market numbers last"""
+    template = ANALYSIS_PROMPTS.get(lang, ANALYSIS_PROMPTS['en'])
+    level = 'beginner' if interpretation_level == 'beginner' else 'advanced'
+    system = [{"type": "text", "text": template[level], "cache_control": {"type": "ephemeral"}}]
+    prompt = (
+        template['intro'].format(name=COINS[symbol], symbol=symbol, days=days)
+        + "\n\n"
+        + template['market'].format(price_change=price_change, **indicators)
+    )
+    return system, prompt
 
-"""
-            if interpretation_level == 'beginner':
-                prompt_base += """Provide a simple explanation (2-3 sentences) of what these indicators mean in plain English. 
-Focus on whether the market sentiment appears positive, negative, or neutral. Avoid jargon.
 
-IMPORTANT: This is educational analysis only, not financial advice. Do not use words like "buy", "sell", or "target price"."""
-            else:
-                prompt_base += """Provide a technical analysis (3-4 sentences) covering:
-1. Overall trend based on indicator alignment
-2. Momentum signals from RSI and MACD trends
-3. Key observations from the 5-day changes
+# Last good analysis per request, served while the model is unavailable
+LAST_ANALYSIS_TTL = 24 * 3600
 
-IMPORTANT: This is educational analysis only, not financial advice. Focus on interpretation, not trading recommendations."""
 
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt_base}]
-        )
-        
-        analysis = message.content[0].text
-        return analysis, confidence
-        
+def _last_analysis_key(symbol, interpretation_level, days, lang):
+    return f"last_analysis:{symbol}:{interpretation_level}:{days}:{lang}"
+
+
+def get_ai_analysis(symbol, interpretation_level='advanced', days=90, lang='en'):
+    """Get AI analysis with timeout and confidence, falling back to the last good result"""
+    if not llm_available():
+        return "AI analysis unavailable: API key not configured.", "N/A"
+    
+    t = TRANSLATIONS.get(lang, TRANSLATIONS['en'])
+    last_key = _last_analysis_key(symbol, interpretation_level, days, lang)
+    
+    try:
+        result = _generate_ai_analysis(symbol, interpretation_level, days, lang)
+    except LLMUnavailableError:
+        error = t.get('ai_error_unavailable', "AI analysis temporarily unavailable. Please try again.")
     except anthropic.APITimeoutError:
-        return t.get('ai_error_timeout', "AI analysis temporarily unavailable (timeout). Please try again."), "N/A"
+        error = t.get('ai_error_timeout', "AI analysis temporarily unavailable (timeout). Please try again.")
     except anthropic.RateLimitError:
-        return t.get('ai_error_rate_limit', "AI analysis temporarily unavailable (rate limit reached). Please try again in a moment."), "N/A"
+        error = t.get('ai_error_rate_limit', "AI analysis temporarily unavailable (rate limit reached). Please try again in a moment.")
     except Exception as e:
         print(f"AI Error: {e}")
-        return t.get('ai_error_general', "AI analysis temporarily unavailable. Please try again."), "N/A"
+        error = t.get('ai_error_general', "AI analysis temporarily unavailable. Please try again.")
+    else:
+        cache.set(last_key, result, timeout=LAST_ANALYSIS_TTL)
+        return result
+    
+    return cache.get(last_key) or (error, "N/A")
+
+
+@cache.memoize(timeout=900)  # Cache for 15 minutes to avoid rate limits
+def _generate_ai_analysis(symbol, interpretation_level, days, lang):
+    """Generate an AI analysis; model errors propagate so they are never cached"""
+    if ANALYSIS_FANOUT:
+        try:
+            results = generate_all_language_analyses(symbol, interpretation_level, days)
+        except AnalysisFormatError as e:
+            print(f"Fan-out analysis unusable, falling back to per-language call: {e}")
+        else:
+            for other_lang, result in results.items():
+                if other_lang != lang:
+                    store_analysis(symbol, interpretation_level, days, other_lang, result)
+            return results.get(lang, results['en'])
+    return _generate_single_analysis(symbol, interpretation_level, days, lang)
+
+
+def _generate_single_analysis(symbol, interpretation_level, days, lang):
+    """Generate one language's analysis with its own model call"""
+    indicators, confidence, price_change = _analysis_inputs(symbol, days)
+    system, prompt = build_analysis_prompt(symbol, interpretation_level, days, lang, indicators, price_change)
+    message = create_message(prompt, max_tokens=1000, timeout=15.0, system=system)
+    
+    analysis = message.content[0].text
+    return analysis, confidence
+
+
+def _analysis_inputs(symbol, days):
+    """Indicators, confidence label and 24h change feeding the analysis prompts"""
+    df = get_crypto_data(symbol, days)
+    indicators = get_indicator_summary(df)
+    confidence = calculate_confidence(indicators)
+    
+    prev = df.iloc[-2]
+    price_change = ((indicators['price'] - prev["Close"]) / prev["Close"]) * 100
+    return indicators, confidence, price_change
 
 
 # -----------------------------
-# ROUTES
+# MULTI-LANGUAGE FAN-OUT
 # -----------------------------
-@app.route("/")
-def home():
+class AnalysisFormatError(ValueError):
+    """Raised when a fan-out response is not the expected JSON document"""
+
+
+def build_fanout_prompt(symbol, interpretation_level, days, indicators, price_change):
+    """Return (system, prompt) asking for every language's analysis as one JSON object"""
+    level = 'beginner' if interpretation_level == 'beginner' else 'advanced'
+    sections = "\n\n".join(
+        f"### {code}\n{ANALYSIS_PROMPTS[code][level]}" for code in TRANSLATIONS
+    )
+    system = [{
+        "type": "text",
+        "text": "Write one analysis of the market data for each language code below, "
+                "in that language and following that language's instructions.\n\n" + sections,
+        "cache_control": {"type": "ephemeral"},
+    }]
+    template = ANALYSIS_PROMPTS['en']
+    prompt = (
+        template['intro'].format(name=COINS[symbol], symbol=symbol, days=days)
+        + "\n\n"
+        + template['market'].format(price_change=price_change, **indicators)
+        + "\n\nRespond with only a JSON object whose keys are: "
+        + ", ".join(TRANSLATIONS)
+        + ". Each value is the analysis text in that language."
+    )
+    return system, prompt
+
+
+def parse_fanout_response(text):
+    """Parse a fan-out reply into {lang: analysis}, requiring every language"""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("{"):]
+    try:
+        analyses = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise AnalysisFormatError(f"invalid JSON: {e}")
+    if not isinstance(analyses, dict):
+        raise AnalysisFormatError("response is not a JSON object")
+    missing = [code for code in TRANSLATIONS if not isinstance(analyses.get(code), str) or not analyses[code].strip()]
+    if missing:
+        raise AnalysisFormatError(f"missing languages: {', '.join(missing)}")
+    return {code: analyses[code].strip() for code in TRANSLATIONS}
+
+
+def generate_all_language_analyses(symbol, interpretation_level, days):
+    """Generate analyses for every supported language with a single model call"""
+    indicators, confidence, price_change = _analysis_inputs(symbol, days)
+    system, prompt = build_fanout_prompt(symbol, interpretation_level, days, indicators, price_change)
+    message = create_message(prompt, max_tokens=1000 * len(TRANSLATIONS), timeout=30.0, system=system)
+    analyses = parse_fanout_response(message.content[0].text)
+    return {code: (analysis, confidence) for code, analysis in analyses.items()}
+
+
+# -----------------------------
+# ANALYSIS PRE-GENERATION
+# -----------------------------
+INTERPRETATION_LEVELS = ['beginner', 'advanced']
+PREGENERATE_DAYS = [int(d) for d in os.environ.get("PREGENERATE_DAYS", "30,90,180,365").split(",")]
+PREGENERATE_WORKERS = int(os.environ.get("PREGENERATE_WORKERS", 4))
+
+
+def store_analysis(symbol, interpretation_level, days, lang, result):
+    """Write an (analysis, confidence) result into the get_ai_analysis cache slots"""
+    cache_key = _generate_ai_analysis.make_cache_key(
+        _generate_ai_analysis.uncached, symbol, interpretation_level, days, lang
+    )
+    cache.set(cache_key, result, timeout=_generate_ai_analysis.cache_timeout)
+    cache.set(_last_analysis_key(symbol, interpretation_level, days, lang), result, timeout=LAST_ANALYSIS_TTL)
+    bump_content_version(symbol, days)
+
+
+def _pregenerate_group(symbol, interpretation_level, days, langs):
+    """Generate analyses for one coin/level/days, fanned out over langs when enabled"""
+    if len(langs) > 1:
+        try:
+            results = generate_all_language_analyses(symbol, interpretation_level, days)
+            return {lang: results[lang] for lang in langs if lang in results}
+        except AnalysisFormatError as e:
+            print(f"Fan-out analysis unusable for {symbol}, generating per language: {e}")
+    return {lang: _generate_single_analysis(symbol, interpretation_level, days, lang) for lang in langs}
+
+
+def pregenerate_analyses(coins=None, langs=None, levels=None, days_values=None, max_workers=None):
+    """Generate every coin x language x level x days analysis and store it in the cache.
+
+    Market data is refreshed sequentially first (yfinance is not thread-safe),
+    then model calls run on a bounded thread pool. Results are written to the
+    cache from this thread only, since concurrent first writes would race on
+    the memoize version key.
+    """
+    coins = coins or list(COINS)
+    langs = langs or list(TRANSLATIONS)
+    levels = levels or INTERPRETATION_LEVELS
+    days_values = days_values or PREGENERATE_DAYS
+    max_workers = max_workers or PREGENERATE_WORKERS
+    started = time.perf_counter()
+
+    available = []
+    for symbol, days in itertools.product(coins, days_values):
+        try:
+            get_crypto_data(symbol, days)
+            available.append((symbol, days))
+        except Exception as e:
+            print(f"Pre-generation: no data for {symbol} ({days}d): {e}")
+
+    if ANALYSIS_FANOUT:
+        groups = [(symbol, level, days, langs) for (symbol, days), level in itertools.product(available, levels)]
+    else:
+        groups = [
+            (symbol, level, days, [lang])
+            for (symbol, days), level, lang in itertools.product(available, levels, langs)
+        ]
+    generated = failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_pregenerate_group, *group): group for group in groups}
+        for future in as_completed(futures):
+            symbol, level, days, group_langs = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"Pre-generation failed for {symbol} {level} {days}d: {e}")
+                results = {}
+            for lang in group_langs:
+                if lang in results:
+                    store_analysis(symbol, level, days, lang, results[lang])
+                    generated += 1
+                else:
+                    failed += 1
+
+    return {
+        'generated': generated,
+        'failed': failed,
+        'skipped_data': (len(coins) * len(days_values)) - len(available),
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+@app.cli.command("pregenerate-analyses")
+@click.option("--coins", default="", help="Comma-separated symbols (default: all)")
+@click.option("--langs", default="", help="Comma-separated language codes (default: all)")
+@click.option("--days", "days_values", default="", help="Comma-separated day ranges")
+@click.option("--workers", default=PREGENERATE_WORKERS, show_default=True, help="Concurrent model calls")
+@click.option("--refresh-data", is_flag=True, help="Drop cached market data before generating")
+def pregenerate_analyses_command(coins, langs, days_values, workers, refresh_data):
+    """Pre-generate AI analyses into the shared cache (run after each data refresh).
+
+    Needs a cache the web workers share, e.g. CACHE_TYPE=redis; with the
+    default in-process cache the results would be lost when the command exits.
+    """
+    if isinstance(cache.cache, (SimpleCache, NullCache)):
+        raise click.ClickException(
+            f"CACHE_TYPE={app.config['CACHE_TYPE']} is private to this process, so the web workers would "
+            "never see the analyses; configure a shared cache such as CACHE_TYPE=redis"
+        )
+    if refresh_data:
+        cache.delete_memoized(get_crypto_data)
+    stats = pregenerate_analyses(
+        coins=[c.upper() for c in coins.split(",") if c],
+        langs=[l for l in langs.split(",") if l],
+        days_values=[int(d) for d in days_values.split(",") if d],
+        max_workers=workers,
+    )
+    click.echo(
+        f"Generated {stats['generated']} analyses, {stats['failed']} failed, "
+        f"{stats['skipped_data']} coin/day ranges without data in {stats['seconds']}s"
+    )
+
+
+# -----------------------------
+# BATCH ANALYSIS
+# -----------------------------
+BATCH_DEADLINE_SECONDS = float(os.environ.get("BATCH_DEADLINE_SECONDS", 20.0))
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 4))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+
+
+def batch_analyses(symbols, interpretation_level, days, lang):
+    """Analyses for several coins: cached ones at once, the rest generated concurrently.
+
+    Returns {symbol: {"status": "ok" | "error" | "timeout", "analysis", "confidence"}}.
+    Generation still running at the deadline keeps going and fills the cache.
+    """
+    keys = {
+        symbol: _generate_ai_analysis.make_cache_key(
+            _generate_ai_analysis.uncached, symbol, interpretation_level, days, lang
+        )
+        for symbol in symbols
+    }
+    results = {}
+    for symbol, cached in zip(keys, cache.get_many(*keys.values())):
+        if cached is not None:
+            analysis, confidence = cached
+            results[symbol] = {"status": "ok", "analysis": analysis, "confidence": confidence}
+
+    missing = [symbol for symbol in symbols if symbol not in results]
+    if not missing:
+        return results
+
+    with request_deadline(BATCH_DEADLINE_SECONDS):
+        frames = get_crypto_data_many(missing, days)
+        futures = {}
+        for symbol in missing:
+            if symbol not in frames:
+                results[symbol] = {"status": "error", "analysis": "No market data available", "confidence": "N/A"}
+                continue
+            # Submitted outside the request deadline so late calls finish and fill the cache
+            futures[_batch_executor.submit(
+                _call_in_app_context, get_ai_analysis, symbol, interpretation_level, days, lang
+            )] = symbol
+
+        try:
+            for future in as_completed(futures, timeout=remaining_budget()):
+                analysis, confidence = future.result()
+                status = "error" if confidence == "N/A" else "ok"
+                results[futures[future]] = {"status": status, "analysis": analysis, "confidence": confidence}
+        except FuturesTimeoutError:
+            pass
+
+    for symbol in missing:
+        if symbol not in results:
+            analysis, confidence = (
+                cache.get(_last_analysis_key(symbol, interpretation_level, days, lang))
+                or (TRANSLATIONS[lang]['analysis_pending'], "N/A")
+            )
+            results[symbol] = {"status": "timeout", "analysis": analysis, "confidence": confidence}
+    return results
+
+
+# -----------------------------
+# RESPONSE CACHE
+# -----------------------------
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 300))
+RESPONSE_CACHE_CONTROL = os.environ.get("RESPONSE_CACHE_CONTROL", "public, max-age=30")
+
+
+def dashboard_params():
+    """Normalized (symbol, interpretation_level, days, lang) from the query string.
+
+    symbol is None for unknown coins; everything else falls back to defaults.
+    """
     symbol = request.args.get("coin", "BTC").upper()
     if symbol not in COINS:
-        symbol = "BTC"
+        symbol = None
 
     interpretation_level = request.args.get('interpretation_level', 'advanced')
-    days = int(request.args.get('days', 90))
+    if interpretation_level not in INTERPRETATION_LEVELS:
+        interpretation_level = 'advanced'
+
+    try:
+        days = int(request.args.get('days', 90))
+    except ValueError:
+        days = 90
+    days = min(max(days, 7), 365)
+
     lang = request.args.get('lang', 'en')
-    
     if lang not in TRANSLATIONS:
         lang = 'en'
-    
-    t = TRANSLATIONS[lang]
-    
-    # Validate days range
-    if days < 7:
-        days = 7
-    elif days > 365:
-        days = 365
 
-    df = get_crypto_data(symbol, days)
-    price = float(df["Close"].iloc[-1])
-    
-    analysis, confidence = get_ai_analysis(symbol, interpretation_level, days, lang)
+    return symbol, interpretation_level, days, lang
 
-    options = "".join(
-        f'<option value="{k}" {"selected" if k==symbol else ""}>{v}</option>'
-        for k, v in COINS.items()
-    )
 
-    interpretation_select = f"""
-        <option value="beginner" {"selected" if interpretation_level=="beginner" else ""}>{t['beginner']}</option>
-        <option value="advanced" {"selected" if interpretation_level=="advanced" else ""}>{t['advanced']}</option>
+def bump_content_version(symbol, days):
+    """Mark cached pages for symbol/days stale after new data or analyses arrive"""
+    cache.set(f"content_version:{symbol}:{days}", time.time_ns(), timeout=get_crypto_data.cache_timeout)
+
+
+def _response_cache_key(prefix):
+    symbol, interpretation_level, days, lang = dashboard_params()
+    if symbol is None:
+        return None
+    version = cache.get(f"content_version:{symbol}:{days}")
+    if version is None:
+        return None
+    return f"response:{prefix}:{symbol}:{interpretation_level}:{days}:{lang}:{version}"
+
+
+def _make_cache_entry(body, mimetype, gzip_level=6, br_quality=9, encodings=('gzip', 'br')):
+    return {
+        'etag': hashlib.sha256(body).hexdigest()[:32],
+        'mimetype': mimetype,
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=gzip_level) if 'gzip' in encodings else None,
+        'br': brotli.compress(body, quality=br_quality) if brotli and 'br' in encodings else None,
+    }
+
+
+def _build_cache_entry(response, encodings=('gzip', 'br')):
+    return _make_cache_entry(response.get_data(), response.mimetype, encodings=encodings)
+
+
+def _accepted_encoding():
+    """The compressed encoding _serve_cache_entry would pick for this request, if any"""
+    encodings = request.accept_encodings
+    if brotli and encodings['br']:
+        return 'br'
+    return 'gzip' if encodings['gzip'] else None
+
+
+def _serve_cache_entry(entry, cache_control=RESPONSE_CACHE_CONTROL):
+    if request.if_none_match.contains_weak(entry['etag']):
+        response = make_response("", 304)
+    else:
+        encodings = request.accept_encodings
+        if entry['br'] is not None and encodings['br']:
+            response = make_response(entry['br'])
+            response.headers['Content-Encoding'] = 'br'
+        elif entry['gzip'] is not None and encodings['gzip']:
+            response = make_response(entry['gzip'])
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = make_response(entry['identity'])
+        response.mimetype = entry['mimetype']
+    response.set_etag(entry['etag'])
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def cached_response(prefix):
+    """Cache a dashboard view's body (plus gzip/brotli variants) per normalized query and content version.
+
+    Responses are served with an ETag and honour If-None-Match. Views set
+    g.skip_response_cache for degraded output that must not be stored; that
+    and other bodies that won't be stored are compressed only in the
+    encoding this client accepts.
     """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache_key = _response_cache_key(prefix)
+            entry = cache.get(cache_key) if cache_key else None
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if g.get('skip_response_cache'):
+                    entry = _build_cache_entry(response, encodings=(_accepted_encoding(),))
+                    return _serve_cache_entry(entry, cache_control="no-cache")
+                # The view may have loaded fresh data and moved the content version
+                cache_key = _response_cache_key(prefix)
+                if not cache_key:
+                    return _serve_cache_entry(_build_cache_entry(response, encodings=(_accepted_encoding(),)))
+                entry = _build_cache_entry(response)
+                cache.set(cache_key, entry, timeout=RESPONSE_CACHE_TIMEOUT)
+            return _serve_cache_entry(entry)
+        return wrapper
+    return decorator
 
-    language_options = "".join(
-        f'<option value="{code}" {"selected" if code==lang else ""}>{name}</option>'
-        for code, name in [('en', 'English'), ('es', 'Español'), ('fr', 'Français'), ('de', 'Deutsch'), ('zh', '中文'), ('tr', 'Türkçe')]
-    )
 
-    # Language-specific example questions
-    if lang == 'es':
-        example_questions = [
-            "¿Qué significa MACD?",
-            "¿Se está fortaleciendo el impulso?",
-            "¿El RSI señala condiciones de sobrecompra?",
-            "¿Qué sugieren las EMAs?",
-            "¿Debería preocuparme por el RSI actual?"
-        ]
-    elif lang == 'fr':
-        example_questions = [
-            "Que signifie MACD?",
-            "Le momentum se renforce-t-il?",
-            "Le RSI signale-t-il des conditions de surachat?",
-            "Que suggèrent les EMA?",
-            "Devrais-je m'inquiéter du RSI actuel?"
-        ]
-    elif lang == 'de':
-        example_questions = [
-            "Was bedeutet MACD?",
-            "Verstärkt sich das Momentum?",
-            "Signalisiert der RSI überkaufte Bedingungen?",
-            "Was schlagen die EMAs vor?",
-            "Sollte ich mir Sorgen über den aktuellen RSI machen?"
-        ]
-    elif lang == 'zh':
-        example_questions = [
-            "MACD是什么意思？",
-            "动量是否在增强？",
-            "RSI是否显示超买状态？",
-            "EMA建议什么？",
-            "我应该担心当前的RSI吗？"
-        ]
-    elif lang == 'tr':
-        example_questions = [
-            "MACD ne anlama gelir?",
-            "Momentum güçleniyor mu?",
-            "RSI aşırı alım koşullarını gösteriyor mu?",
-            "EMA'lar ne öneriyor?",
-            "Mevcut RSI konusunda endişelenmeli miyim?"
-        ]
-    else:  # English
-        example_questions = [
-            "What does MACD mean?",
-            "Is momentum strengthening?",
-            "Is RSI signaling overbought conditions?",
-            "What do the EMAs suggest?",
-            "Should I be concerned about the current RSI?"
-        ]
+# -----------------------------
+# STATIC ASSETS
+# -----------------------------
+# Files in static/ are served from /assets/ under content-hashed names, so
+# browsers keep them forever and a changed file simply gets a new URL
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-    example_buttons = "".join([
-        f'<button class="example-btn" onclick="document.getElementById(\'ai-question\').value=\'{q}\'; askAI();">{q}</button>'
-        for q in example_questions
-    ])
-
-    return f"""
-    <!DOCTYPE html>
-    <html lang="{lang}">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{COINS[symbol]} {t['title']}</title>
-        <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
-        <style>
-            * {{
-                margin: 0;
-                padding: 0;
-                box-sizing: border-box;
-            }}
-            
-            body {{
-                font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-            }}
-            
-            .header {{
-                text-align: center;
-                color: white;
-                margin-bottom: 30px;
-            }}
-            
-            .header h1 {{
-                font-size: 2.5rem;
-                font-weight: 700;
-                margin-bottom: 10px;
-                text-shadow: 2px 2px 4px rgba(0,0,0,0.2);
-            }}
-            
-            .price-display {{
-                font-size: 2rem;
-                font-weight: 600;
-                color: #4ade80;
-                text-shadow: 1px 1px 2px rgba(0,0,0,0.2);
-            }}
-            
-            .container {{
-                max-width: 1400px;
-                margin: 0 auto;
-                background: white;
-                border-radius: 20px;
-                padding: 40px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            }}
-            
-            .controls {{
-                display: flex;
-                justify-content: center;
-                gap: 20px;
-                margin-bottom: 30px;
-                flex-wrap: wrap;
-            }}
-            
-            .control-group {{
-                display: flex;
-                flex-direction: column;
-                gap: 8px;
-            }}
-            
-            .control-group label {{
-                font-weight: 600;
-                color: #374151;
-                font-size: 0.9rem;
-                text-transform: uppercase;
-                letter-spacing: 0.5px;
-            }}
-            
-            select {{
-                padding: 12px 20px;
-                font-size: 16px;
-                border: 2px solid #e5e7eb;
-                border-radius: 10px;
-                background: white;
-                cursor: pointer;
-                font-weight: 500;
-                transition: all 0.3s;
-            }}
-            
-            select:hover {{
-                border-color: #667eea;
-            }}
-            
-            select:focus {{
-                outline: none;
-                border-color: #667eea;
-                box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-            }}
-            
-            .timeline-control {{
-                display: flex;
-                flex-direction: column;
-                gap: 8px;
-                min-width: 300px;
-            }}
-            
-            .timeline-control input[type="range"] {{
-                width: 100%;
-                height: 8px;
-                border-radius: 5px;
-                background: #e5e7eb;
-                outline: none;
-                -webkit-appearance: none;
-            }}
-            
-            .timeline-control input[type="range"]::-webkit-slider-thumb {{
-                -webkit-appearance: none;
-                appearance: none;
-                width: 20px;
-                height: 20px;
-                border-radius: 50%;
-                background: #667eea;
-                cursor: pointer;
-                transition: all 0.3s;
-            }}
-            
-            .timeline-control input[type="range"]::-webkit-slider-thumb:hover {{
-                background: #764ba2;
-                transform: scale(1.2);
-            }}
-            
-            .timeline-control input[type="range"]::-moz-range-thumb {{
-                width: 20px;
-                height: 20px;
-                border-radius: 50%;
-                background: #667eea;
-                cursor: pointer;
-                border: none;
-                transition: all 0.3s;
-            }}
-            
-            .timeline-control input[type="range"]::-moz-range-thumb:hover {{
-                background: #764ba2;
-                transform: scale(1.2);
-            }}
-            
-            .timeline-value {{
-                text-align: center;
-                font-weight: 600;
-                color: #667eea;
-                font-size: 1.1rem;
-            }}
-            
-            .info-card {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 25px;
-                border-radius: 15px;
-                margin-bottom: 25px;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            }}
-            
-            .info-card h3 {{
-                font-size: 1.3rem;
-                margin-bottom: 15px;
-                display: flex;
-                align-items: center;
-                gap: 10px;
-            }}
-            
-            .confidence-badge {{
-                display: inline-block;
-                padding: 6px 16px;
-                border-radius: 20px;
-                font-size: 0.85rem;
-                font-weight: 600;
-                background: rgba(255,255,255,0.2);
-                backdrop-filter: blur(10px);
-            }}
-            
-            .info-card p {{
-                line-height: 1.8;
-                font-size: 1.05rem;
-            }}
-            
-            .subscription-card {{
-                background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
-                color: white;
-                padding: 25px;
-                border-radius: 15px;
-                margin-bottom: 25px;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            }}
-            
-            .subscription-card h3 {{
-                font-size: 1.3rem;
-                margin-bottom: 10px;
-            }}
-            
-            .subscription-card .subtitle {{
-                margin-bottom: 20px;
-                opacity: 0.9;
-            }}
-            
-            .subscription-form {{
-                display: flex;
-                gap: 10px;
-                margin-bottom: 15px;
-            }}
-            
-            .subscription-input {{
-                flex: 1;
-                padding: 12px 18px;
-                font-size: 16px;
-                border: 2px solid rgba(255,255,255,0.3);
-                border-radius: 10px;
-                background: rgba(255,255,255,0.2);
-                color: white;
-                font-family: inherit;
-            }}
-            
-            .subscription-input::placeholder {{
-                color: rgba(255,255,255,0.7);
-            }}
-            
-            .subscription-button {{
-                padding: 12px 30px;
-                font-size: 16px;
-                background: white;
-                color: #d97706;
-                border: none;
-                border-radius: 10px;
-                cursor: pointer;
-                font-weight: 600;
-                transition: all 0.3s;
-            }}
-            
-            .subscription-button:hover {{
-                background: #fef3c7;
-                transform: translateY(-2px);
-            }}
-            
-            .premium-features {{
-                list-style: none;
-                padding: 0;
-            }}
-            
-            .premium-features li {{
-                padding: 5px 0;
-                opacity: 0.95;
-            }}
-            
-            .question-card {{
-                background: #f9fafb;
-                border: 2px solid #e5e7eb;
-                padding: 25px;
-                border-radius: 15px;
-                margin-bottom: 25px;
-            }}
-            
-            .question-card h3 {{
-                color: #1f2937;
-                font-size: 1.3rem;
-                margin-bottom: 10px;
-            }}
-            
-            .question-card .subtitle {{
-                color: #6b7280;
-                margin-bottom: 20px;
-            }}
-            
-            .input-group {{
-                display: flex;
-                gap: 10px;
-                margin-bottom: 15px;
-            }}
-            
-            .question-input {{
-                flex: 1;
-                padding: 14px 18px;
-                font-size: 16px;
-                border: 2px solid #e5e7eb;
-                border-radius: 10px;
-                font-family: inherit;
-                transition: all 0.3s;
-            }}
-            
-            .question-input:focus {{
-                outline: none;
-                border-color: #667eea;
-                box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-            }}
-            
-            .ask-button {{
-                padding: 14px 35px;
-                font-size: 16px;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                border: none;
-                border-radius: 10px;
-                cursor: pointer;
-                font-weight: 600;
-                transition: all 0.3s;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            }}
-            
-            .ask-button:hover {{
-                transform: translateY(-2px);
-                box-shadow: 0 6px 12px rgba(0,0,0,0.15);
-            }}
-            
-            .ask-button:disabled {{
-                background: #9ca3af;
-                cursor: not-allowed;
-                transform: none;
-            }}
-            
-            .example-questions {{
-                display: flex;
-                flex-wrap: wrap;
-                gap: 10px;
-                margin-bottom: 15px;
-            }}
-            
-            .example-btn {{
-                padding: 8px 16px;
-                background: white;
-                border: 2px solid #e5e7eb;
-                border-radius: 20px;
-                cursor: pointer;
-                font-size: 0.9rem;
-                transition: all 0.3s;
-                font-family: inherit;
-            }}
-            
-            .example-btn:hover {{
-                background: #667eea;
-                color: white;
-                border-color: #667eea;
-            }}
-            
-            .answer-box {{
-                background: white;
-                border: 2px solid #667eea;
-                padding: 20px;
-                border-radius: 10px;
-                margin-top: 15px;
-                display: none;
-            }}
-            
-            .answer-box.show {{
-                display: block;
-                animation: slideIn 0.3s ease;
-            }}
-            
-            @keyframes slideIn {{
-                from {{
-                    opacity: 0;
-                    transform: translateY(-10px);
-                }}
-                to {{
-                    opacity: 1;
-                    transform: translateY(0);
-                }}
-            }}
-            
-            .loading {{
-                color: #667eea;
-                font-style: italic;
-            }}
-            
-            .chart-container {{
-                margin-top: 30px;
-                border-radius: 15px;
-                overflow: hidden;
-                box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            }}
-            
-            .chart-container img {{
-                width: 100%;
-                height: auto;
-                display: block;
-            }}
-            
-            .disclaimer {{
-                background: #fef3c7;
-                border-left: 4px solid #f59e0b;
-                padding: 15px 20px;
-                border-radius: 10px;
-                margin-top: 20px;
-                font-size: 0.9rem;
-                color: #92400e;
-            }}
-            
-            .footer {{
-                text-align: center;
-                margin-top: 30px;
-                padding-top: 20px;
-                border-top: 2px solid #e5e7eb;
-                color: #6b7280;
-                font-size: 0.9rem;
-            }}
-            
-            @media (max-width: 768px) {{
-                .header h1 {{
-                    font-size: 1.8rem;
-                }}
-                .price-display {{
-                    font-size: 1.5rem;
-                }}
-                .container {{
-                    padding: 20px;
-                }}
-                .controls {{
-                    flex-direction: column;
-                    gap: 15px;
-                }}
-                .input-group {{
-                    flex-direction: column;
-                }}
-                .subscription-form {{
-                    flex-direction: column;
-                }}
-                .timeline-control {{
-                    min-width: 100%;
-                }}
-            }}
-        </style>
-        <script>
-            function updateTimeline(value) {{
-                const daysText = '{t['days']}';
-                document.getElementById('timeline-value').textContent = value + ' ' + daysText;
-                const form = document.getElementById('timeline-form');
-                form.submit();
-            }}
-            
-            async function askAI() {{
-                const question = document.getElementById('ai-question').value.trim();
-                const answerBox = document.getElementById('answer-box');
-                const answerText = document.getElementById('answer-text');
-                const askButton = document.getElementById('ask-button');
-                const lang = '{lang}';
-                const t = {{
-                    thinking: '{t['thinking']}',
-                    error: '{t['error']}',
-                    answer: '{t['answer']}'
-                }};
-                
-                if (!question) {{
-                    alert('Please enter a question!');
-                    return;
-                }}
-                
-                askButton.disabled = true;
-                answerBox.classList.add('show');
-                answerText.innerHTML = '<span class="loading">' + t.thinking + '</span>';
-                
-                try {{
-                    const response = await fetch('/api/ask', {{
-                        method: 'POST',
-                        headers: {{'Content-Type': 'application/json'}},
-                        body: JSON.stringify({{question: question, symbol: '{symbol}'}})
-                    }});
-                    
-                    const data = await response.json();
-                    
-                    if (data.error) {{
-                        answerText.innerHTML = '<strong style="color: #dc2626;">' + t.error + '</strong> ' + data.error;
-                    }} else {{
-                        answerText.innerHTML = '<strong>' + t.answer + '</strong> ' + data.answer;
-                    }}
-                }} catch (error) {{
-                    answerText.innerHTML = '<strong style="color: #dc2626;">' + t.error + '</strong> Failed to get answer. Please try again.';
-                }} finally {{
-                    askButton.disabled = false;
-                }}
-            }}
-            
-            function handleSubscribe(event) {{
-                event.preventDefault();
-                const email = document.getElementById('subscribe-email').value;
-                const lang = '{lang}';
-                const button = event.target.querySelector('button');
-                const originalText = button.textContent;
-                
-                button.disabled = true;
-                button.textContent = 'Sending...';
-                
-                fetch('/api/subscribe', {{
-                    method: 'POST',
-                    headers: {{'Content-Type': 'application/json'}},
-                    body: JSON.stringify({{email: email, lang: lang}})
-                }})
-                .then(response => response.json())
-                .then(data => {{
-                    if (data.success) {{
-                        alert(data.message);
-                        document.getElementById('subscribe-email').value = '';
-                    }} else {{
-                        alert('Error: ' + (data.error || 'Failed to subscribe'));
-                    }}
-                }})
-                .catch(error => {{
-                    alert('Error: Failed to subscribe. Please try again.');
-                }})
-                .finally(() => {{
-                    button.disabled = false;
-                    button.textContent = originalText;
-                }});
-            }}
-            
-            document.addEventListener('DOMContentLoaded', function() {{
-                document.getElementById('ai-question').addEventListener('keypress', function(e) {{
-                    if (e.key === 'Enter') askAI();
-                }});
-            }});
-        </script>
-    </head>
-    <body>
-        <div class="header">
-            <h1>📈 {COINS[symbol]} {t['title']}</h1>
-            <div class="price-display">${price:,.2f} USD</div>
-        </div>
-        
-        <div class="container">
-            <div class="controls">
-                <div class="control-group">
-                    <label for="coin">{t['cryptocurrency']}</label>
-                    <form method="get" style="margin: 0;">
-                        <select name="coin" id="coin" onchange="this.form.submit()">
-                            {options}
-                        </select>
-                        <input type="hidden" name="interpretation_level" value="{interpretation_level}">
-                        <input type="hidden" name="days" value="{days}">
-                        <input type="hidden" name="lang" value="{lang}">
-                    </form>
-                </div>
-                
-                <div class="control-group">
-                    <label for="interpretation_level">{t['analysis_level']}</label>
-                    <form method="get" style="margin: 0;">
-                        <select name="interpretation_level" id="interpretation_level" onchange="this.form.submit()">
-                            {interpretation_select}
-                        </select>
-                        <input type="hidden" name="coin" value="{symbol}">
-                        <input type="hidden" name="days" value="{days}">
-                        <input type="hidden" name="lang" value="{lang}">
-                    </form>
-                </div>
-                
-                <div class="control-group">
-                    <label for="language">{t['language']}</label>
-                    <form method="get" style="margin: 0;">
-                        <select name="lang" id="language" onchange="this.form.submit()">
-                            {language_options}
-                        </select>
-                        <input type="hidden" name="coin" value="{symbol}">
-                        <input type="hidden" name="interpretation_level" value="{interpretation_level}">
-                        <input type="hidden" name="days" value="{days}">
-                    </form>
-                </div>
-            </div>
 
-            <div class="subscription-card">
-                <h3>⭐ {t['subscribe']}</h3>
-                <p class="subtitle">{t['subscribe_desc']}</p>
-                <form class="subscription-form" onsubmit="handleSubscribe(event)">
-                    <input 
-                        type="email" 
-                        id="subscribe-email" 
-                        class="subscription-input" 
-                        placeholder="{t['email_placeholder']}"
-                        required
-                    />
-                    <button type="submit" class="subscription-button">{t['subscribe_button']}</button>
-                </form>
-                <div class="premium-features">
-                    <strong>{t['premium_features']}</strong>
-                    <ul style="list-style: none; padding: 0; margin-top: 10px;">
-                        <li>{t['feature_1']}</li>
-                        <li>{t['feature_2']}</li>
-                        <li>{t['feature_3']}</li>
-                        <li>{t['feature_4']}</li>
-                    </ul>
-                </div>
-            </div>
+@functools.lru_cache(maxsize=None)
+def static_assets():
+    """Map each static file to its fingerprinted name, and that name to a pre-compressed entry"""
+    urls, entries = {}, {}
+    for name in sorted(os.listdir(app.static_folder)):
+        path = os.path.join(app.static_folder, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            body = f.read()
+        stem, ext = os.path.splitext(name)
+        fingerprinted = f"{stem}.{hashlib.sha256(body).hexdigest()[:12]}{ext}"
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        urls[name] = f"/assets/{fingerprinted}"
+        entries[fingerprinted] = _make_cache_entry(body, mimetype, gzip_level=9, br_quality=11)
+    return urls, entries
+
+
+def asset_url(name):
+    return static_assets()[0][name]
+
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+
+# -----------------------------
+# WORKER LIFECYCLE (see gunicorn.conf.py)
+# -----------------------------
+WARM_COINS = [c for c in os.environ.get("WARM_COINS", ",".join(COINS)).split(",") if c in COINS]
+WARM_DAYS = int(os.environ.get("WARM_DAYS", 90))
+WARM_DEADLINE_SECONDS = float(os.environ.get("WARM_DEADLINE_SECONDS", 30))
+
+
+def warm_caches(coins=None, days=None):
+    """Load market data and render charts (and with them matplotlib's fonts) up front.
+
+    Market data comes in one batched download and the whole warm-up stops at
+    WARM_DEADLINE_SECONDS; coins not warmed by then are loaded on first use.
+    """
+    coins = WARM_COINS if coins is None else coins
+    days = days or WARM_DAYS
+    warmed = 0
+    warm_imports()
+    static_assets()
+    for kind in EMAIL_CONTENT:
+        for lang in TRANSLATIONS:
+            email_template(kind, lang)
+    # Called directly rather than via the stage/chart pools: the gunicorn master
+    # must not start threads that forked workers would inherit half-alive
+    with app.app_context(), request_deadline(WARM_DEADLINE_SECONDS):
+        frames = get_crypto_data_many(coins, days)
+        for i, symbol in enumerate(coins):
+            if remaining_budget() <= 0:
+                print(f"⚠️ Warm-up deadline reached; {len(coins) - i} coin(s) start cold")
+                break
+            if symbol not in frames:
+                print(f"⚠️ Could not warm {symbol}: no data")
+                continue
+            try:
+                create_chart(symbol, days)
+                warmed += 1
+            except Exception as e:
+                print(f"⚠️ Could not warm {symbol}: {e}")
+    return warmed
+
+
+def reinit_after_fork():
+    """Drop connections a forked worker inherited from the master"""
+    # Pooled DB connections belong to the parent; close=False leaves its sockets alone
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # yfinance shares one HTTP session per process; give the worker its own.
+    # The Anthropic and SendGrid clients are created per call and need nothing.
+    try:
+        from yfinance.data import YfData, new_session
+        YfData(session=new_session())
+    except Exception as e:
+        print(f"⚠️ Could not reset yfinance session: {e}")
+
+
+# -----------------------------
+# HOME PAGE FRAGMENTS
+# -----------------------------
+LANGUAGE_NAMES = [('en', 'English'), ('es', 'Español'), ('fr', 'Français'), ('de', 'Deutsch'), ('zh', '中文'), ('tr', 'Türkçe')]
+
+EXAMPLE_QUESTIONS = {
+    'en': [
+        "What does MACD mean?",
+        "Is momentum strengthening?",
+        "Is RSI signaling overbought conditions?",
+        "What do the EMAs suggest?",
+        "Should I be concerned about the current RSI?",
+    ],
+    'es': [
+        "¿Qué significa MACD?",
+        "¿Se está fortaleciendo el impulso?",
+        "¿El RSI señala condiciones de sobrecompra?",
+        "¿Qué sugieren las EMAs?",
+        "¿Debería preocuparme por el RSI actual?",
+    ],
+    'fr': [
+        "Que signifie MACD?",
+        "Le momentum se renforce-t-il?",
+        "Le RSI signale-t-il des conditions de surachat?",
+        "Que suggèrent les EMA?",
+        "Devrais-je m'inquiéter du RSI actuel?",
+    ],
+    'de': [
+        "Was bedeutet MACD?",
+        "Verstärkt sich das Momentum?",
+        "Signalisiert der RSI überkaufte Bedingungen?",
+        "Was schlagen die EMAs vor?",
+        "Sollte ich mir Sorgen über den aktuellen RSI machen?",
+    ],
+    'zh': [
+        "MACD是什么意思？",
+        "动量是否在增强？",
+        "RSI是否显示超买状态？",
+        "EMA建议什么？",
+        "我应该担心当前的RSI吗？",
+    ],
+    'tr': [
+        "MACD ne anlama gelir?",
+        "Momentum güçleniyor mu?",
+        "RSI aşırı alım koşullarını gösteriyor mu?",
+        "EMA'lar ne öneriyor?",
+        "Mevcut RSI konusunda endişelenmeli miyim?",
+    ],
+}
+
+
+@functools.lru_cache(maxsize=None)
+def home_fragments(lang):
+    """Render the parts of the home page that only vary by language, once per lang"""
+    return {
+        'head': Markup(home_head_template.render(config={
+            'lang': lang,
+            't': {key: TRANSLATIONS[lang][key] for key in ('days', 'thinking', 'error', 'answer')},
+            'quotePollMs': int(QUOTE_TTL * 1000),
+            'liveStream': LIVE_STREAM,
+        })),
+        'language_options': Markup(language_options_template.render(languages=LANGUAGE_NAMES, selected=lang)),
+        'example_buttons': Markup(example_buttons_template.render(questions=EXAMPLE_QUESTIONS[lang])),
+    }
+
 
-            <div class="info-card">
-                <h3>
-                    🤖 {t['ai_analysis']}
-                    <span class="confidence-badge">{t['confidence']}: {confidence}</span>
-                </h3>
-                <p>{analysis}</p>
-            </div>
+# Per-request values; everything else in HOME_TEMPLATE is fixed per language
+HOME_DYNAMIC_FIELDS = (
+    'symbol', 'coin_name', 'price_display', 'analysis', 'confidence',
+    'interpretation_level', 'days', 'coin_options', 'interpretation_options',
+)
 
-            <div class="question-card">
-                <h3>💬 {t['ask_questions']}</h3>
-                <p class="subtitle">{t['questions_subtitle']}</p>
-                
-                <div class="example-questions">
-                    <small style="width: 100%; display: block; margin-bottom: 8px; color: #6b7280; font-weight: 600;">{t['quick_questions']}</small>
-                    {example_buttons}
-                </div>
-                
-                <div class="input-group">
-                    <input 
-                        type="text" 
-                        id="ai-question" 
-                        class="question-input" 
-                        placeholder="{t['type_question']}"
-                    />
-                    <button id="ask-button" class="ask-button" onclick="askAI()">{t['ask_ai']}</button>
-                </div>
-                
-                <div id="answer-box" class="answer-box">
-                    <div id="answer-text"></div>
-                </div>
-            </div>
 
-            <div class="timeline-control">
-                <label for="timeline">{t['timeline']}: <span id="timeline-value" class="timeline-value">{days} {t['days']}</span></label>
-                <form id="timeline-form" method="get">
-                    <input type="range" id="timeline" name="days" min="7" max="365" value="{days}" 
-                           oninput="updateTimeline(this.value)">
-                    <input type="hidden" name="coin" value="{symbol}">
-                    <input type="hidden" name="interpretation_level" value="{interpretation_level}">
-                    <input type="hidden" name="lang" value="{lang}">
-                </form>
-            </div>
+# Marks a per-request slot in a pre-rendered page; NUL never occurs in the
+# templates, translations or fragments
+_PAGE_SLOT = re.compile("\x00(\\w+)\x00")
 
-            <div class="chart-container">
-                <img src="/chart?coin={symbol}&days={days}" alt="{COINS[symbol]} Technical Analysis Chart"/>
-            </div>
 
-            <div class="disclaimer">
-                <strong>⚠️ {t['disclaimer_title']}</strong> {t['disclaimer_text']}
-            </div>
-            
-            <div class="footer">
-                {t['copyright']}
-            </div>
-        </div>
-    </body>
-    </html>
+class PageShell:
+    """A page rendered once with marked slots, filled per request by concatenation.
+
+    The rendered text is never compiled again, so braces in translations or
+    fragments stay text. Values are escaped as Jinja would (Markup passes as is).
     """
 
+    def __init__(self, source, fields):
+        parts = _PAGE_SLOT.split(source)
+        self._static = parts[0::2]
+        self._slots = parts[1::2]
+        unknown = set(self._slots) - set(fields)
+        if unknown:
+            raise ValueError(f"Unexpected page slots: {', '.join(sorted(unknown))}")
+
+    def render(self, **values):
+        out = [self._static[0]]
+        for name, static in zip(self._slots, self._static[1:]):
+            out.append(escape(values[name]))
+            out.append(static)
+        return "".join(out)
+
+
+@functools.lru_cache(maxsize=None)
+def home_page_template(lang):
+    """Pre-render HOME_TEMPLATE for one language, leaving slots for the dynamic fields"""
+    slots = {name: Markup(f"\x00{name}\x00") for name in HOME_DYNAMIC_FIELDS}
+    source = home_template.render(lang=lang, t=TRANSLATIONS[lang], fragments=home_fragments(lang), **slots)
+    return PageShell(source, HOME_DYNAMIC_FIELDS)
+
+
+@functools.lru_cache(maxsize=None)
+def coin_options(symbol):
+    return Markup(coin_options_template.render(coins=COINS, selected=symbol))
+
+
+@functools.lru_cache(maxsize=None)
+def _interpretation_options(lang, level):
+    return Markup(interpretation_options_template.render(t=TRANSLATIONS[lang], selected=level))
+
+
+def interpretation_options(lang, interpretation_level):
+    # Unknown levels share one cache entry so user input cannot grow the cache
+    level = interpretation_level if interpretation_level in INTERPRETATION_LEVELS else None
+    return _interpretation_options(lang, level)
+
+
+# -----------------------------
+# ROUTES
+# -----------------------------
+@app.route("/")
+@cached_response("home")
+def home():
+    symbol, interpretation_level, days, lang = dashboard_params()
+    symbol = symbol or "BTC"
+    t = TRANSLATIONS[lang]
+
+    # Data and AI share one budget; whatever misses it falls back to the
+    # last known value or a placeholder instead of holding up the page
+    price = analysis = None
+    confidence = "N/A"
+    with request_deadline(HOME_DEADLINE_SECONDS):
+        try:
+            get_quotes([symbol], wait=False)
+            df = splice_quote(run_within_deadline(get_crypto_data, symbol, days), symbol)
+            price = float(df["Close"].iloc[-1])
+            cache.set(f"last_price:{symbol}", price, timeout=LAST_ANALYSIS_TTL)
+            analysis, confidence = run_within_deadline(get_ai_analysis, symbol, interpretation_level, days, lang)
+        except DeadlineExceeded as e:
+            print(f"Home deadline exceeded during {e}")
+        except Exception as e:
+            print(f"Home degraded: {e}")
+    
+    if price is None or confidence == "N/A":
+        g.skip_response_cache = True
+    if price is None:
+        price = cache.get(f"last_price:{symbol}")
+    if analysis is None:
+        analysis, confidence = (
+            cache.get(_last_analysis_key(symbol, interpretation_level, days, lang))
+            or (t['analysis_pending'], "N/A")
+        )
+    price_display = f"${price:,.2f} USD" if price is not None else "— USD"
+
+    return home_page_template(lang).render(
+        symbol=symbol,
+        coin_name=COINS[symbol],
+        price_display=price_display,
+        analysis=analysis,
+        confidence=confidence,
+        interpretation_level=interpretation_level,
+        days=days,
+        coin_options=coin_options(symbol),
+        interpretation_options=interpretation_options(lang, interpretation_level),
+    )
+
+
+# pyplot keeps global figure state, so charts render on one dedicated thread
+# instead of inside whichever request thread asked for them; a real OS thread
+# under gevent too, or the ~1 s of matplotlib work would stall the hub
+_chart_executor = _native_thread_pool(1, "chart")
+
 
 @app.route("/chart")
 def chart():
@@ -1812,7 +3307,7 @@ def chart():
         days = 365
 
     try:
-        img_bytes, _ = create_chart(symbol, days)
+        img_bytes, _ = _chart_executor.submit(_call_in_app_context, create_chart, symbol, days).result()
         return send_file(io.BytesIO(img_bytes), mimetype="image/png")
     except Exception as e:
         print(f"Error creating chart: {e}")
@@ -1820,17 +3315,16 @@ def chart():
 
 
 @app.route("/api/analysis")
+@cached_response("analysis")
 def api_analysis():
-    symbol = request.args.get("coin", "BTC").upper()
-    if symbol not in COINS:
+    symbol, interpretation_level, days, lang = dashboard_params()
+    if symbol is None:
         return jsonify({"error": "Invalid coin"}), 400
     
-    interpretation_level = request.args.get('interpretation_level', 'advanced')
-    days = int(request.args.get('days', 90))
-    lang = request.args.get('lang', 'en')
-    
     df = get_crypto_data(symbol, days)
     analysis, confidence = get_ai_analysis(symbol, interpretation_level, days, lang)
+    if confidence == "N/A":
+        g.skip_response_cache = True
     
     return jsonify({
         "symbol": symbol,
@@ -1843,10 +3337,130 @@ def api_analysis():
     })
 
 
+@app.route("/api/analysis/batch")
+def api_analysis_batch():
+    """Analyses for ?coins=BTC,ETH,... in one document; "partial" flags failed or late coins"""
+    if not request.args.get("coins"):
+        return jsonify({"error": "coins is required"}), 400
+    symbols = requested_coins()
+    if not symbols:
+        return jsonify({"error": "Invalid coin"}), 400
+    _, interpretation_level, days, lang = dashboard_params()
+
+    results = batch_analyses(symbols, interpretation_level, days, lang)
+    return jsonify({
+        "results": [
+            {"symbol": symbol, "name": COINS[symbol], **results[symbol]}
+            for symbol in symbols
+        ],
+        "partial": any(result["status"] != "ok" for result in results.values()),
+        "interpretation_level": interpretation_level,
+        "days": days,
+        "language": lang
+    })
+
+
+def requested_coins():
+    """Valid symbols from ?coins=BTC,ETH (all coins when omitted), without repeats"""
+    coins = request.args.get("coins")
+    return list(dict.fromkeys(c for c in coins.upper().split(",") if c in COINS)) if coins else list(COINS)
+
+
+@app.route("/assets/<name>")
+@limiter.exempt
+def asset(name):
+    entry = static_assets()[1].get(name)
+    if entry is None:
+        return "Not found", 404
+    return _serve_cache_entry(entry, cache_control=ASSET_CACHE_CONTROL)
+
+
+@app.route("/api/quote")
+@limiter.limit("120 per minute")
+def quote():
+    """Latest prices for ?coins=BTC,ETH (all coins when omitted)"""
+    symbols = requested_coins()
+    if not symbols:
+        return jsonify({"error": "Invalid coin"}), 400
+
+    quotes = get_quotes(symbols)
+    now = time.time()
+    return jsonify({
+        "quotes": {
+            symbol: {
+                "price": q["price"],
+                "as_of": pd.Timestamp(q["as_of"]).isoformat(),
+                "age": round(now - q["fetched"], 3),
+            }
+            for symbol, q in quotes.items()
+        }
+    })
+
+
+@app.route("/api/stream")
+@limiter.limit("30 per minute")
+def stream():
+    """Server-Sent Events with price and indicator changes for ?coins=BTC,ETH"""
+    if not LIVE_STREAM:
+        return jsonify({"error": "Live stream is disabled"}), 404
+    symbols = requested_coins()
+    if not symbols:
+        return jsonify({"error": "Invalid coin"}), 400
+    if stream_publisher.client_count() >= STREAM_MAX_CLIENTS:
+        return jsonify({"error": "Too many open streams, try again later"}), 503
+
+    def events():
+        # Subscribing inside the generator ties it to the finally below, which
+        # runs when the client goes away
+        client = stream_publisher.subscribe(symbols)
+        try:
+            yield f"retry: {int(STREAM_INTERVAL * 1000)}\n\n".encode()
+            while True:
+                try:
+                    yield client.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+        finally:
+            stream_publisher.unsubscribe(client, symbols)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+@app.route("/api/health/llm")
+@limiter.exempt
+def llm_health():
+    """Expose circuit breaker and in-flight limiter state for this worker"""
+    return jsonify({
+        "pid": os.getpid(),
+        "backend": LLM_BACKEND,
+        "breaker": llm_breaker.snapshot(),
+        "limiter": llm_limiter.snapshot(),
+        "budget": {"limit": LLM_GLOBAL_LIMIT, "remaining": llm_budget_remaining()},
+        "usage": dict(llm_usage),
+    })
+
+
+ASK_SYSTEM_PROMPT = [{
+    "type": "text",
+    "text": """You are a helpful cryptocurrency education assistant. The user is viewing technical charts.
+
+Provide a clear, educational answer (2-4 sentences). When explaining indicators:
+- Reference the current chart values
+- Use phrases like "On the RSI panel..." or "Looking at the price chart..."
+- Explain concepts in context
+
+IMPORTANT: This is educational only. Avoid trading recommendations. Do not use "buy", "sell", or "target" language.""",
+    "cache_control": {"type": "ephemeral"},
+}]
+
+
 @app.route("/api/ask", methods=["POST"])
 @limiter.limit("10 per minute")
 def ask_ai():
-    if not ANTHROPIC_API_KEY:
+    if not llm_available():
         return jsonify({"error": "API key not configured"}), 500
     
     try:
@@ -1860,9 +3474,7 @@ def ask_ai():
         df = get_crypto_data(symbol)
         indicators = get_indicator_summary(df)
         
-        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, timeout=10.0)
-        
-        prompt = f"""You are a helpful cryptocurrency education assistant. The user is viewing {COINS[symbol]} ({symbol}) technical charts.
+        prompt = f"""The user is viewing {COINS[symbol]} ({symbol}) technical charts.
 
 Current market context:
 - Price: ${indicators['price']:.2f}
@@ -1870,26 +3482,17 @@ Current market context:
 - MACD Histogram: {indicators['macd_hist']:.4f}
 - Price vs EMA-50: {indicators['price_vs_ema50_pct']:+.2f}%
 
-User question: {question}
-
-Provide a clear, educational answer (2-4 sentences). When explaining indicators:
-- Reference the current chart values
-- Use phrases like "On the RSI panel..." or "Looking at the price chart..."
-- Explain concepts in context
+User question: {question}"""
 
-IMPORTANT: This is educational only. Avoid trading recommendations. Do not use "buy", "sell", or "target" language."""
-
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=500,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        message = create_message(prompt, max_tokens=500, timeout=10.0, system=ASK_SYSTEM_PROMPT)
         
         return jsonify({
             "answer": message.content[0].text,
             "question": question
         })
         
+    except LLMUnavailableError:
+        return jsonify({"error": "AI assistant is temporarily unavailable. Please try again shortly."}), 503
     except anthropic.APITimeoutError:
         return jsonify({"error": "Request timed out. Please try again."}), 504
     except anthropic.RateLimitError:
@@ -1918,31 +3521,46 @@ def subscribe():
             return jsonify({"error": "Invalid email format"}), 400
         
         # Save to database
-        existing = Subscription.query.filter_by(email=email).first()
-        if not existing:
-            sub = Subscription(email=email, language=lang)
-            db.session.add(sub)
-            db.session.commit()
-        
-        # Send the welcome email
-        email_sent = send_subscription_email(email, lang)
+        # The welcome email is queued in the same transaction and sent by the
+        # outbox dispatcher, so this request only waits for the database
+        if insert_if_absent(Subscription, email=email, language=lang):
+            enqueue_email('subscription', email, lang)
+        db.session.commit()
+        wake_email_dispatcher()
         
-        if email_sent:
-            return jsonify({
-                "success": True,
-                "message": f"Thank you for subscribing! We've sent premium information to {email}"
-            })
-        else:
-            return jsonify({
-                "success": True,
-                "message": f"Subscription recorded for {email}. Email delivery may be delayed.",
-                "warning": "Email service temporarily unavailable"
-            })
+        return jsonify({
+            "success": True,
+            "message": f"Thank you for subscribing! We're sending premium information to {email}"
+        })
         
     except Exception as e:
         print(f"Subscribe Error: {e}")
         return jsonify({"error": "Failed to process subscription"}), 500
 
+
+def _unsubscribe_token_key():
+    return f"unsubscribe:{request.args.get('token', '')}"
+
+
+# One-click POSTs (RFC 8058) come from mail providers' shared addresses, so
+# they are limited per token, not per client; the confirmation page per client
+@app.route("/unsubscribe", methods=["GET", "POST"])
+@limiter.limit("20 per hour", methods=["GET"])
+@limiter.limit("5 per hour", methods=["POST"], key_func=_unsubscribe_token_key)
+def unsubscribe():
+    """Unsubscribe link from bulk emails: GET asks, POST (the page's button or a one-click client) removes"""
+    email = unsubscribe_email(request.args.get("token", ""))
+    if email is None:
+        t = TRANSLATIONS['en']
+        return render_template_string(UNSUBSCRIBE_TEMPLATE, t=t, message=t['unsubscribe_invalid']), 400
+    lang = db.session.scalar(db.select(Subscription.language).where(Subscription.email == email))
+    t = TRANSLATIONS.get(lang, TRANSLATIONS['en'])
+    if request.method == "POST":
+        db.session.execute(db.delete(Subscription).where(Subscription.email == email))
+        db.session.commit()
+        return render_template_string(UNSUBSCRIBE_TEMPLATE, t=t, message=t['unsubscribe_done'].format(email=email))
+    return render_template_string(UNSUBSCRIBE_TEMPLATE, t=t, message=t['unsubscribe_prompt'].format(email=email), confirm=True)
+
 # -----------------------------
 # AUTHENTICATION ROUTES
 # -----------------------------
@@ -1958,7 +3576,17 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         
-        if user and user.check_password(password):
+        try:
+            authenticated = bool(user) and user.check_password(password)
+        except PasswordHashBusy:
+            return render_template_string(LOGIN_TEMPLATE, error=PASSWORD_HASH_BUSY_MESSAGE), 503, {'Retry-After': '1'}
+        
+        if authenticated:
+            if user.password_needs_rehash():
+                # Upgrade to the current PASSWORD_HASH_METHOD while we have the plaintext
+                with contextlib.suppress(PasswordHashBusy):
+                    user.set_password(password)
+                    db.session.commit()
             login_user(user)
             return redirect(url_for('home'))
         
@@ -1988,7 +3616,10 @@ def register():
             error = 'Email already registered'
         else:
             user = User(email=email)
-            user.set_password(password)
+            try:
+                user.set_password(password)
+            except PasswordHashBusy:
+                return render_template_string(REGISTER_TEMPLATE, error=PASSWORD_HASH_BUSY_MESSAGE), 503, {'Retry-After': '1'}
             db.session.add(user)
             db.session.commit()
             login_user(user)
@@ -2000,6 +3631,7 @@ def register():
 @app.route('/logout')
 @login_required
 def logout():
+    invalidate_user(current_user.id)
     logout_user()
     return redirect(url_for('login'))
 
@@ -2007,17 +3639,87 @@ def logout():
 # -----------------------------
 # WATCHLIST API
 # -----------------------------
+WATCHLIST_DAYS = 90
+
+
+def _market_fields(df):
+    """Daily-history part of a watchlist entry"""
+    indicators = get_indicator_summary(df)
+    return {
+        'day': df.index[-1].normalize(),
+        'close': float(indicators['price']),
+        'prev_close': float(df['Close'].iloc[-2]),
+        'rsi': None if pd.isna(indicators['rsi']) else round(float(indicators['rsi']), 2),
+        'confidence': calculate_confidence(indicators),
+    }
+
+
+def _with_live_price(fields, quote):
+    """Price and 24h change from the live quote, as splice_quote would place it"""
+    price, prev_close = fields['close'], fields['prev_close']
+    if quote is not None:
+        day = quote_day(quote)
+        if day > fields['day']:
+            prev_close = fields['close']
+        if day >= fields['day']:
+            price = quote['price']
+    return {
+        'price': price,
+        'change_24h': (price - prev_close) / prev_close * 100,
+        'rsi': fields['rsi'],
+        'confidence': fields['confidence'],
+    }
+
+
+def watchlist_market(symbols, days=WATCHLIST_DAYS):
+    """Price, 24h change, RSI and confidence per coin, independent of how many coins.
+
+    The per-coin fields are small cache entries tied to the data's content
+    version, so a warm call is one multi-get; coins missing there come from
+    get_crypto_data_many (one more multi-get, one download for the rest). RSI
+    and confidence follow the daily data, price and change the live quotes.
+    Coins without data are left out.
+    """
+    keys = [f"watchlist_market:{symbol}:{days}" for symbol in symbols]
+    cached = cache.get_many(*keys, *(f"content_version:{symbol}:{days}" for symbol in symbols))
+    fields = {
+        symbol: entry['fields']
+        for symbol, entry, version in zip(symbols, cached, cached[len(symbols):])
+        if entry is not None and version is not None and entry['version'] == version
+    }
+
+    missing = [symbol for symbol in symbols if symbol not in fields]
+    if missing:
+        frames = get_crypto_data_many(missing, days)
+        versions = cache.get_many(*(f"content_version:{symbol}:{days}" for symbol in frames))
+        entries = {}
+        for (symbol, df), version in zip(frames.items(), versions):
+            fields[symbol] = _market_fields(df)
+            if version is not None:
+                entries[f"watchlist_market:{symbol}:{days}"] = {'version': version, 'fields': fields[symbol]}
+        if entries:
+            cache.set_many(entries, timeout=get_crypto_data.cache_timeout)
+
+    quotes = get_quotes(list(fields), wait=False)
+    return {symbol: _with_live_price(fields[symbol], quotes.get(symbol)) for symbol in symbols if symbol in fields}
+
+
 @app.route('/api/watchlist', methods=['GET'])
 @login_required
 def get_watchlist():
+    """The user's coins with live market fields (null where no data is available; ?market=0 skips them)"""
     watchlist_items = Watchlist.query.filter_by(user_id=current_user.id).all()
+    with_market = request.args.get('market', '1') != '0'
+    market = watchlist_market([item.symbol for item in watchlist_items]) if with_market and watchlist_items else {}
+    empty = dict.fromkeys(('price', 'change_24h', 'rsi', 'confidence'))
     return jsonify({
         'watchlist': [{
             'id': item.id,
             'symbol': item.symbol,
             'coin_name': COINS.get(item.symbol, item.symbol),
             'added_at': item.added_at.isoformat(),
-            'notes': item.notes
+            'notes': item.notes,
+            **(market.get(item.symbol, empty) if with_market else {})
         } for item in watchlist_items]
     })
 
@@ -2032,12 +3734,8 @@ def add_to_watchlist():
     if symbol not in COINS:
         return jsonify({'error': 'Invalid symbol'}), 400
     
-    existing = Watchlist.query.filter_by(user_id=current_user.id, symbol=symbol).first()
-    if existing:
+    if not insert_if_absent(Watchlist, user_id=current_user.id, symbol=symbol, notes=notes):
         return jsonify({'error': 'Already in watchlist'}), 400
-    
-    watchlist_item = Watchlist(user_id=current_user.id, symbol=symbol, notes=notes)
-    db.session.add(watchlist_item)
     db.session.commit()
     
     return jsonify({'success': True, 'message': f'{COINS[symbol]} added to watchlist'})
@@ -2050,12 +3748,76 @@ def remove_from_watchlist(item_id):
     if not item:
         return jsonify({'error': 'Item not found'}), 404
     
+    db.session.execute(db.delete(Alert).where(Alert.user_id == current_user.id, Alert.symbol == item.symbol))
     db.session.delete(item)
     db.session.commit()
     
     return jsonify({'success': True, 'message': 'Removed from watchlist'})
 
 
+# -----------------------------
+# ALERTS API
+# -----------------------------
+def _alert_json(alert):
+    return {
+        'id': alert.id,
+        'symbol': alert.symbol,
+        'coin_name': COINS.get(alert.symbol, alert.symbol),
+        'metric': alert.metric,
+        'direction': alert.direction,
+        'threshold': alert.threshold,
+        'active': alert.active,
+        'created_at': alert.created_at.isoformat(),
+        'triggered_at': alert.triggered_at.isoformat() if alert.triggered_at else None,
+        'triggered_value': alert.triggered_value,
+    }
+
+
+@app.route('/api/alerts', methods=['GET'])
+@login_required
+def get_alerts():
+    alerts = Alert.query.filter_by(user_id=current_user.id).order_by(Alert.id).all()
+    return jsonify({'alerts': [_alert_json(alert) for alert in alerts]})
+
+
+@app.route('/api/alerts', methods=['POST'])
+@login_required
+def create_alert():
+    """Alert on a watchlisted coin's price or RSI crossing a threshold (fires once)"""
+    data = request.get_json() or {}
+    symbol = str(data.get('symbol', '')).upper()
+    metric = data.get('metric')
+    direction = data.get('direction')
+    try:
+        threshold = float(data.get('threshold'))
+    except (TypeError, ValueError):
+        threshold = math.nan
+
+    if metric not in ALERT_METRICS or direction not in ALERT_DIRECTIONS or not math.isfinite(threshold):
+        return jsonify({'error': 'Invalid alert'}), 400
+    if not Watchlist.query.filter_by(user_id=current_user.id, symbol=symbol).first():
+        return jsonify({'error': 'Coin not in watchlist'}), 400
+    if Alert.query.filter_by(user_id=current_user.id, active=True).count() >= ALERTS_PER_USER:
+        return jsonify({'error': f'At most {ALERTS_PER_USER} active alerts'}), 400
+
+    alert = Alert(user_id=current_user.id, symbol=symbol, metric=metric, direction=direction, threshold=threshold)
+    db.session.add(alert)
+    db.session.commit()
+    return jsonify({'success': True, 'alert': _alert_json(alert)})
+
+
+@app.route('/api/alerts/<int:alert_id>', methods=['DELETE'])
+@login_required
+def delete_alert(alert_id):
+    alert = Alert.query.filter_by(id=alert_id, user_id=current_user.id).first()
+    if not alert:
+        return jsonify({'error': 'Alert not found'}), 404
+
+    db.session.delete(alert)
+    db.session.commit()
+    return jsonify({'success': True})
+
+
 # -----------------------------
 # USER SETTINGS API
 # -----------------------------
@@ -2081,6 +3843,137 @@ def user_settings():
     })
 
 
+# -----------------------------
+# DAILY DIGEST
+# -----------------------------
+# `flask send-digest`, run once a day by a scheduler. Market fields are
+# computed once and the analysis and email once per language (only for
+# languages that have subscribers); subscribers are then read a chunk at a
+# time and each chunk goes out as one bulk send.
+DIGEST_COINS = [c for c in os.environ.get("DIGEST_COINS", "BTC,ETH,SOL").split(",") if c in COINS]
+DIGEST_INTERPRETATION_LEVEL = os.environ.get("DIGEST_INTERPRETATION_LEVEL", "beginner")
+DIGEST_DAYS = 90
+DIGEST_CHUNK_SIZE = int(os.environ.get("DIGEST_CHUNK_SIZE", SENDGRID_MAX_PERSONALIZATIONS))
+DIGEST_SEND_ATTEMPTS = 3
+
+
+def digest_recipients(lang, chunk_size=DIGEST_CHUNK_SIZE):
+    """Subscribers of one digest language as lists of (id, email), by keyset pagination.
+
+    Unknown or missing languages get the English digest.
+    """
+    if lang == 'en':
+        others = [code for code in TRANSLATIONS if code != 'en']
+        condition = db.or_(Subscription.language.is_(None), Subscription.language.not_in(others))
+    else:
+        condition = Subscription.language == lang
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Subscription.id, Subscription.email)
+            .where(condition, Subscription.id > last_id)
+            .order_by(Subscription.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def _format_price(price):
+    return f"{price:,.2f}" if price >= 1 else f"{price:.6g}"
+
+
+def digest_email(lang, market, date):
+    """Subject, HTML and text of one language's digest, with the bulk tags for address and unsubscribe link
+
+    Coins whose analysis is not ready (placeholder or error text) go out without one.
+    """
+    t = TRANSLATIONS[lang]
+    analyses = batch_analyses(list(market), DIGEST_INTERPRETATION_LEVEL, DIGEST_DAYS, lang)
+    subject = t['digest_subject'].format(date=date)
+    html = _minify_email_html(digest_email_template.render(
+        t=t,
+        subject=subject,
+        footer=t['digest_footer'].format(email=BULK_EMAIL_TAG),
+        unsubscribe_url=BULK_UNSUBSCRIBE_TAG,
+        coins=[{
+            'symbol': symbol,
+            'name': COINS[symbol],
+            'price': _format_price(fields['price']),
+            'change': f"{fields['change_24h']:+.2f}%",
+            'rsi': 'N/A' if fields['rsi'] is None else f"{fields['rsi']:.1f}",
+            'confidence': fields['confidence'],
+            'analysis': analyses[symbol]['analysis'] if analyses[symbol]['status'] == 'ok' else None,
+        } for symbol, fields in market.items()],
+    ))
+    return SimpleNamespace(subject=subject, html=html, text=html_to_text(html))
+
+
+def send_digest(date=None, chunk_size=DIGEST_CHUNK_SIZE, transport=None):
+    """Send the digest to every subscriber; returns counts and timings per language"""
+    transport = transport or email_transport
+    date = date or datetime.utcnow().strftime("%Y-%m-%d")
+    started = time.monotonic()
+    market = watchlist_market(DIGEST_COINS, DIGEST_DAYS)
+    if not market:
+        raise RuntimeError("No market data for the digest")
+
+    stats = {'languages': {}, 'sent': 0, 'failed': 0}
+    for lang in TRANSLATIONS:
+        email = None
+        lang_stats = {'sent': 0, 'failed': 0, 'chunks': 0, 'seconds': 0.0}
+        lang_started = time.monotonic()
+        for rows in digest_recipients(lang, chunk_size):
+            if email is None:
+                email = digest_email(lang, market, date)
+            chunk = SimpleNamespace(**vars(email), key=f"digest:{date}:{lang}:{rows[0].id}-{rows[-1].id}")
+            recipients = [row.email for row in rows]
+            for attempt in range(1, DIGEST_SEND_ATTEMPTS + 1):
+                try:
+                    transport.send_bulk(chunk, recipients)
+                    lang_stats['sent'] += len(recipients)
+                    break
+                except Exception as e:
+                    print(f"⚠️ Digest chunk {chunk.key} failed (attempt {attempt}): {e}")
+                    if attempt == DIGEST_SEND_ATTEMPTS:
+                        lang_stats['failed'] += len(recipients)
+                    else:
+                        time.sleep(2 ** attempt)
+            lang_stats['chunks'] += 1
+        if email is not None:
+            lang_stats['seconds'] = round(time.monotonic() - lang_started, 2)
+            stats['languages'][lang] = lang_stats
+            stats['sent'] += lang_stats['sent']
+            stats['failed'] += lang_stats['failed']
+
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    stats['per_second'] = round(stats['sent'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+    return stats
+
+
+@app.cli.command("send-digest")
+@click.option("--date", default=None, help="Date shown in the digest (default: today, UTC)")
+@click.option("--chunk-size", default=DIGEST_CHUNK_SIZE, show_default=True, help="Recipients per bulk send")
+def send_digest_command(date, chunk_size):
+    """Send the daily market digest to every subscriber"""
+    if email_transport is None:
+        raise click.ClickException("No email transport configured")
+    stats = send_digest(date, chunk_size)
+    for lang, lang_stats in stats['languages'].items():
+        click.echo(
+            f"{lang}: {lang_stats['sent']} sent, {lang_stats['failed']} failed "
+            f"in {lang_stats['chunks']} chunk(s), {lang_stats['seconds']}s"
+        )
+    click.echo(
+        f"Sent {stats['sent']} digest(s), {stats['failed']} failed, "
+        f"in {stats['seconds']}s ({stats['per_second']} emails/s)"
+    )
+    if stats['failed']:
+        raise SystemExit(1)
+
+
 # HTML TEMPLATES
 LOGIN_TEMPLATE = """
 <!DOCTYPE html>
@@ -2088,60 +3981,7 @@ LOGIN_TEMPLATE = """
 <head>
     <title>Login - Crypto Dashboard</title>
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body {
-            font-family: 'Inter', sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        .auth-container {
-            background: white;
-            padding: 40px;
-            border-radius: 20px;
-            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            width: 100%;
-            max-width: 400px;
-        }
-        h2 { color: #667eea; margin-bottom: 30px; text-align: center; }
-        .form-group { margin-bottom: 20px; }
-        label { display: block; margin-bottom: 8px; font-weight: 600; color: #374151; }
-        input {
-            width: 100%;
-            padding: 12px;
-            border: 2px solid #e5e7eb;
-            border-radius: 10px;
-            font-size: 16px;
-            font-family: inherit;
-        }
-        input:focus { outline: none; border-color: #667eea; }
-        button {
-            width: 100%;
-            padding: 14px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            border-radius: 10px;
-            font-size: 16px;
-            font-weight: 600;
-            cursor: pointer;
-        }
-        button:hover { opacity: 0.9; }
-        .error { 
-            background: #fee2e2; 
-            color: #dc2626; 
-            padding: 12px; 
-            border-radius: 8px;
-            margin-bottom: 15px; 
-            text-align: center; 
-        }
-        .link { text-align: center; margin-top: 20px; color: #6b7280; }
-        .link a { color: #667eea; text-decoration: none; font-weight: 600; }
-        .link a:hover { text-decoration: underline; }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('auth.css') }}">
 </head>
 <body>
     <div class="auth-container">
@@ -2174,61 +4014,7 @@ REGISTER_TEMPLATE = """
 <head>
     <title>Register - Crypto Dashboard</title>
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body {
-            font-family: 'Inter', sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        .auth-container {
-            background: white;
-            padding: 40px;
-            border-radius: 20px;
-            box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-            width: 100%;
-            max-width: 400px;
-        }
-        h2 { color: #667eea; margin-bottom: 30px; text-align: center; }
-        .form-group { margin-bottom: 20px; }
-        label { display: block; margin-bottom: 8px; font-weight: 600; color: #374151; }
-        input {
-            width: 100%;
-            padding: 12px;
-            border: 2px solid #e5e7eb;
-            border-radius: 10px;
-            font-size: 16px;
-            font-family: inherit;
-        }
-        input:focus { outline: none; border-color: #667eea; }
-        button {
-            width: 100%;
-            padding: 14px;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border: none;
-            border-radius: 10px;
-            font-size: 16px;
-            font-weight: 600;
-            cursor: pointer;
-        }
-        button:hover { opacity: 0.9; }
-        .error { 
-            background: #fee2e2; 
-            color: #dc2626; 
-            padding: 12px; 
-            border-radius: 8px;
-            margin-bottom: 15px; 
-            text-align: center; 
-        }
-        .link { text-align: center; margin-top: 20px; color: #6b7280; }
-        .link a { color: #667eea; text-decoration: none; font-weight: 600; }
-        .link a:hover { text-decoration: underline; }
-        .hint { font-size: 12px; color: #6b7280; margin-top: 4px; }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('auth.css') }}">
 </head>
 <body>
     <div class="auth-container">
@@ -2260,5 +4046,229 @@ REGISTER_TEMPLATE = """
 </html>
 """
 
+UNSUBSCRIBE_TEMPLATE = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>{{ t.digest_unsubscribe }} - Crypto Dashboard</title>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+    <link rel="stylesheet" href="{{ asset_url('auth.css') }}">
+</head>
+<body>
+    <div class="auth-container">
+        <h2>✉️ {{ t.digest_unsubscribe }}</h2>
+        <p>{{ message }}</p>
+        {% if confirm %}
+        <form method="POST">
+            <button type="submit">{{ t.digest_unsubscribe }}</button>
+        </form>
+        {% endif %}
+    </div>
+</body>
+</html>
+"""
+
+HOME_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="{{ lang }}">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ coin_name }} {{ t.title }}</title>
+    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap" rel="stylesheet">
+    {{ fragments.head }}
+</head>
+<body>
+    <div class="header">
+        <h1>📈 {{ coin_name }} {{ t.title }}</h1>
+        <div class="price-display">{{ price_display }}</div>
+    </div>
+
+    <div class="container">
+        <div class="controls">
+            <div class="control-group">
+                <label for="coin">{{ t.cryptocurrency }}</label>
+                <form method="get" style="margin: 0;">
+                    <select name="coin" id="coin" onchange="this.form.submit()">
+                        {{ coin_options }}
+                    </select>
+                    <input type="hidden" name="interpretation_level" value="{{ interpretation_level }}">
+                    <input type="hidden" name="days" value="{{ days }}">
+                    <input type="hidden" name="lang" value="{{ lang }}">
+                </form>
+            </div>
+
+            <div class="control-group">
+                <label for="interpretation_level">{{ t.analysis_level }}</label>
+                <form method="get" style="margin: 0;">
+                    <select name="interpretation_level" id="interpretation_level" onchange="this.form.submit()">
+                        {{ interpretation_options }}
+                    </select>
+                    <input type="hidden" name="coin" value="{{ symbol }}">
+                    <input type="hidden" name="days" value="{{ days }}">
+                    <input type="hidden" name="lang" value="{{ lang }}">
+                </form>
+            </div>
+
+            <div class="control-group">
+                <label for="language">{{ t.language }}</label>
+                <form method="get" style="margin: 0;">
+                    <select name="lang" id="language" onchange="this.form.submit()">
+                        {{ fragments.language_options }}
+                    </select>
+                    <input type="hidden" name="coin" value="{{ symbol }}">
+                    <input type="hidden" name="interpretation_level" value="{{ interpretation_level }}">
+                    <input type="hidden" name="days" value="{{ days }}">
+                </form>
+            </div>
+        </div>
+
+        <div class="subscription-card">
+            <h3>⭐ {{ t.subscribe }}</h3>
+            <p class="subtitle">{{ t.subscribe_desc }}</p>
+            <form class="subscription-form" onsubmit="handleSubscribe(event)">
+                <input 
+                    type="email" 
+                    id="subscribe-email" 
+                    class="subscription-input" 
+                    placeholder="{{ t.email_placeholder }}"
+                    required
+                />
+                <button type="submit" class="subscription-button">{{ t.subscribe_button }}</button>
+            </form>
+            <div class="premium-features">
+                <strong>{{ t.premium_features }}</strong>
+                <ul style="list-style: none; padding: 0; margin-top: 10px;">
+                    <li>{{ t.feature_1 }}</li>
+                    <li>{{ t.feature_2 }}</li>
+                    <li>{{ t.feature_3 }}</li>
+                    <li>{{ t.feature_4 }}</li>
+                </ul>
+            </div>
+        </div>
+
+        <div class="info-card">
+            <h3>
+                🤖 {{ t.ai_analysis }}
+                <span class="confidence-badge">{{ t.confidence }}: {{ confidence }}</span>
+            </h3>
+            <p>{{ analysis }}</p>
+        </div>
+
+        <div class="question-card">
+            <h3>💬 {{ t.ask_questions }}</h3>
+            <p class="subtitle">{{ t.questions_subtitle }}</p>
+
+            <div class="example-questions">
+                <small style="width: 100%; display: block; margin-bottom: 8px; color: #6b7280; font-weight: 600;">{{ t.quick_questions }}</small>
+                {{ fragments.example_buttons }}
+            </div>
+
+            <div class="input-group">
+                <input 
+                    type="text" 
+                    id="ai-question" 
+                    class="question-input" 
+                    placeholder="{{ t.type_question }}"
+                />
+                <button id="ask-button" class="ask-button" onclick="askAI()">{{ t.ask_ai }}</button>
+            </div>
+
+            <div id="answer-box" class="answer-box">
+                <div id="answer-text"></div>
+            </div>
+        </div>
+
+        <div class="timeline-control">
+            <label for="timeline">{{ t.timeline }}: <span id="timeline-value" class="timeline-value">{{ days }} {{ t.days }}</span></label>
+            <form id="timeline-form" method="get">
+                <input type="range" id="timeline" name="days" min="7" max="365" value="{{ days }}" 
+                       oninput="updateTimeline(this.value)">
+                <input type="hidden" name="coin" value="{{ symbol }}">
+                <input type="hidden" name="interpretation_level" value="{{ interpretation_level }}">
+                <input type="hidden" name="lang" value="{{ lang }}">
+            </form>
+        </div>
+
+        <div class="chart-container">
+            <img src="/chart?coin={{ symbol }}&days={{ days }}" alt="{{ coin_name }} Technical Analysis Chart"/>
+        </div>
+
+        <div class="disclaimer">
+            <strong>⚠️ {{ t.disclaimer_title }}</strong> {{ t.disclaimer_text }}
+        </div>
+
+        <div class="footer">
+            {{ t.copyright }}
+        </div>
+    </div>
+</body>
+</html>
+
+"""
+
+# Rendered once per language by home_fragments()
+HOME_HEAD_TEMPLATE = """
+    <link rel="stylesheet" href="{{ asset_url('dashboard.css') }}">
+    <script>const DASHBOARD = {{ config|tojson }};</script>
+    <script src="{{ asset_url('dashboard.js') }}" defer></script>
+"""
+
+LANGUAGE_OPTIONS_TEMPLATE = """{% for code, name in languages %}<option value="{{ code }}" {{ 'selected' if code == selected }}>{{ name }}</option>{% endfor %}"""
+
+COIN_OPTIONS_TEMPLATE = """{% for code, name in coins.items() %}<option value="{{ code }}" {{ 'selected' if code == selected }}>{{ name }}</option>{% endfor %}"""
+
+INTERPRETATION_OPTIONS_TEMPLATE = """
+    <option value="beginner" {{ 'selected' if selected == 'beginner' }}>{{ t.beginner }}</option>
+    <option value="advanced" {{ 'selected' if selected == 'advanced' }}>{{ t.advanced }}</option>
+"""
+
+EXAMPLE_BUTTONS_TEMPLATE = """{% for q in questions %}<button class="example-btn" onclick="document.getElementById('ai-question').value=this.textContent; askAI();">{{ q }}</button>{% endfor %}"""
+
+DIGEST_EMAIL_TEMPLATE = """
+<html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #667eea;">{{ subject }}</h2>
+            <p>{{ t.digest_intro }}</p>
+            {% for coin in coins %}
+            <div style="background: #f9fafb; padding: 16px; border-radius: 10px; margin: 16px 0;">
+                <h3 style="color: #667eea; margin: 0 0 8px;">{{ coin.name }} ({{ coin.symbol }})</h3>
+                <p style="margin: 0 0 8px;">
+                    <strong>{{ t.price }}:</strong> ${{ coin.price }} &middot;
+                    <strong>{{ t.digest_change }}:</strong> {{ coin.change }} &middot;
+                    <strong>RSI:</strong> {{ coin.rsi }} &middot;
+                    <strong>{{ t.confidence }}:</strong> {{ coin.confidence }}
+                </p>
+                {% if coin.analysis %}
+                <p style="margin: 0; white-space: pre-line;">{{ coin.analysis }}</p>
+                {% endif %}
+            </div>
+            {% endfor %}
+            <p style="font-size: 12px; color: #6b7280;">{{ t.disclaimer_text }}</p>
+            <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 30px 0;">
+            <p style="font-size: 12px; color: #6b7280; text-align: center;">
+                {{ t.copyright }}<br>
+                {{ footer }}<br>
+                <a href="{{ unsubscribe_url }}" style="color: #6b7280;">{{ t.digest_unsubscribe }}</a>
+            </p>
+        </div>
+    </body>
+</html>
+"""
+
+# Compile once at import; requests only render
+home_template = app.jinja_env.from_string(HOME_TEMPLATE)
+home_head_template = app.jinja_env.from_string(HOME_HEAD_TEMPLATE)
+language_options_template = app.jinja_env.from_string(LANGUAGE_OPTIONS_TEMPLATE)
+coin_options_template = app.jinja_env.from_string(COIN_OPTIONS_TEMPLATE)
+interpretation_options_template = app.jinja_env.from_string(INTERPRETATION_OPTIONS_TEMPLATE)
+example_buttons_template = app.jinja_env.from_string(EXAMPLE_BUTTONS_TEMPLATE)
+digest_email_template = app.jinja_env.from_string(DIGEST_EMAIL_TEMPLATE)
+
 if __name__ == "__main__":
+    with app.app_context():
+        upgrade_schema()
+    start_email_dispatcher()
+    start_alert_engine()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8000)), debug=False)